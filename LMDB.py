@@ -2,25 +2,98 @@ import random
 import lmdb
 import zlib  # For compressing FEN strings
 import numpy as np # For more efficient packing
+from board import Board
+from headers import POSITION_SIZE
 from typing import Generator, Optional, Tuple
 
 from sympy import Ge
 
+LEGACY_KEY_PREFIX = b"\x78" # zlib header byte, every legacy key starts with it and no packed position does
+MIGRATION_BATCH_SIZE = 10_000 # Legacy keys migrated per write transaction
+
 class LMDBWrapper:
-    def __init__(self, db_path: str, map_size: int = 10 * 1024**3):
-        """Initialize LMDB database."""
+    def __init__(self, db_path: str, map_size: int = 10 * 1024**3, migrate: bool = True):
+        """
+        Initialize LMDB database.
+        Legacy scoreboard keys are migrated to packed positions on open, see `migrate_keys`. Pass migrate=False
+        from worker processes that open a database the main process already opened, so they don't migrate it at the same time.
+        """
         self.env = lmdb.open(db_path, map_size=map_size, writemap=True, map_async=True, readahead=True, lock=False, max_readers=126)
+        if migrate and self.has_legacy_keys():
+            migrated, dropped = self.migrate_keys()
+            print(f"Migrated {format(migrated, ',d')} legacy scoreboard keys to packed positions, dropped {format(dropped, ',d')} invalid ones")
 
-    def _encode_key(self, key: str) -> bytes:
-        """Encode key (FEN string) using zlib compression."""
+    def _encode_key(self, key: bytes | str) -> bytes:
+        """
+        Encode key, a position packed by `Board.encode_position`, which is stored as is.
+        Legacy scoreboard array strings are still accepted and stored zlib compressed.
+        """
+        if isinstance(key, bytes):
+            return key
         return zlib.compress(key.encode())
 
-    def _decode_key(self, key_bytes: bytes) -> str:
-        """Decode key (FEN string) from compressed bytes."""
+    def _decode_key(self, key_bytes: bytes) -> bytes | str:
+        """
+        Decode key back into a packed position, or into a scoreboard array string for legacy keys.
+        Legacy keys start with the zlib header byte 0x78, which no packed position starts with (it would put a black pawn on b1).
+        """
+        if len(key_bytes) == POSITION_SIZE and key_bytes[0] != 0x78:
+            return key_bytes
         return zlib.decompress(key_bytes).decode()
 
-    def put(self, key: str, value: Tuple[float, int]) -> None:
-        """Store a key-value pair where key is FEN and value is (eval, count)."""
+    def has_legacy_keys(self) -> bool:
+        """Return whether the database still has legacy scoreboard keys. Keys are sorted, so they all sit together and one seek finds them."""
+        with self.env.begin() as txn:
+            with txn.cursor() as cursor:
+                return cursor.set_range(LEGACY_KEY_PREFIX) and cursor.key()[:1] == LEGACY_KEY_PREFIX
+
+    def migrate_keys(self) -> Tuple[int, int]:
+        """
+        Move every entry stored under a legacy zlib scoreboard key to the packed position key of the same position,
+        and return the number of entries moved and dropped. When the packed key already has an entry, the two are merged:
+        the counts are added and the evals averaged weighted by them. Scoreboard arrays have no side to move,
+        so white to move is assumed, which is how the game saver stored them (positions after black's moves).
+        Entries whose scoreboard is not a valid position can't be read as a position either, they are deleted
+        so no legacy key is left behind and the migration only runs once.
+        """
+        board = Board()
+        dtype = np.dtype([('eval', np.float32), ('count', np.uint32)])
+        migrated = dropped = 0
+        while True:
+            with self.env.begin(write=True) as txn:
+                cursor = txn.cursor()
+                if not cursor.set_range(LEGACY_KEY_PREFIX):
+                    break
+                batch = []
+                for key_bytes, value_bytes in cursor:
+                    if key_bytes[:1] != LEGACY_KEY_PREFIX or len(batch) == MIGRATION_BATCH_SIZE:
+                        break
+                    batch.append((key_bytes, value_bytes))
+                if not batch:
+                    break
+                
+                for key_bytes, value_bytes in batch:
+                    txn.delete(key_bytes)
+                    try:
+                        board.parse_fen(board.from_scoreboard_array(self._decode_key(key_bytes)))
+                    except (AssertionError, ValueError, zlib.error):
+                        dropped += 1
+                        continue
+                    key = board.encode_position()
+                    value = np.frombuffer(value_bytes, dtype=dtype, count=1)[0]
+                    eval_value, count = float(value['eval']), int(value['count'])
+                    if (existing_bytes := txn.get(key)) is not None:
+                        existing = np.frombuffer(existing_bytes, dtype=dtype, count=1)[0]
+                        total = count + int(existing['count'])
+                        if total:
+                            eval_value = (eval_value * count + float(existing['eval']) * int(existing['count'])) / total
+                        count = total
+                    txn.put(key, np.array((eval_value, count), dtype=dtype).tobytes())
+                    migrated += 1
+        return migrated, dropped
+
+    def put(self, key: bytes, value: Tuple[float, int]) -> None:
+        """Store a key-value pair where key is a packed position and value is (eval, count)."""
         # Use numpy for efficient packing: float32 (eval), uint32 (count)
         packed_value = np.array(value, dtype=[('eval', np.float32), ('count', np.uint32)]).tobytes()
         with self.env.begin(write=True) as txn:
@@ -38,7 +111,7 @@ class LMDBWrapper:
                 items.append((self._encode_key(k), packed_value))
             cursor.putmulti(items)
 
-    def get(self, key: str) -> Optional[Tuple[float, int]]:
+    def get(self, key: bytes) -> Optional[Tuple[float, int]]:
         """Retrieve a value by key."""
         with self.env.begin() as txn:
             value_bytes = txn.get(self._encode_key(key))
@@ -50,7 +123,7 @@ class LMDBWrapper:
             else:
                 return None
 
-    def get_or_default(self, key: str, default: Tuple[float, int]) -> Tuple[float, int]:
+    def get_or_default(self, key: bytes, default: Tuple[float, int]) -> Tuple[float, int]:
         """Retrieve a value by key, or return default if not found."""
         with self.env.begin() as txn:
             value_bytes = txn.get(self._encode_key(key))
@@ -62,12 +135,12 @@ class LMDBWrapper:
             else:
                 return default
 
-    def delete(self, key: str) -> bool:
+    def delete(self, key: bytes) -> bool:
         """Delete a key from the database."""
         with self.env.begin(write=True) as txn:
             return txn.delete(self._encode_key(key))
 
-    def keys(self) -> Generator[str, None, None]:
+    def keys(self) -> Generator[bytes, None, None]:
         """List all keys in the database."""
         with self.env.begin() as txn:
             with txn.cursor() as cursor:
@@ -82,7 +155,7 @@ class LMDBWrapper:
                     value_array = np.frombuffer(value_bytes, dtype=dtype, count=1)
                     yield value_array[0]['eval'], value_array[0]['count']
 
-    def items(self) -> Generator[Tuple[str, Tuple[float, int]], None, None]:
+    def items(self) -> Generator[Tuple[bytes, Tuple[float, int]], None, None]:
         """Iterate over all key-value pairs."""
         with self.env.begin() as txn:
             with txn.cursor() as cursor:
@@ -113,7 +186,7 @@ class LMDBWrapper:
         self.env.sync()
         self.env.close()
         
-    def get_random_item(self) -> Optional[Tuple[str, Tuple[float, int]]]:
+    def get_random_item(self) -> Optional[Tuple[bytes, Tuple[float, int]]]:
         """Retrieve a random key-value pair from the database."""
         with self.env.begin() as txn:
             with txn.cursor() as cursor:
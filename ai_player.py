@@ -3,80 +3,78 @@ from board import Board
 from player import Player
 from headers import *
 import numpy as np
+from position_encoding import snapshots_to_tensors
+from search import Search
+from time_control import TimeControl
+from transposition import TranspositionTable
 
 class AIPlayer(Player):
     """
     SmartPlayer is a subclass of Player that represents a chess player 
     using a database to evaluate and make moves.
     """
-    def __init__(self, board: Board, model, color: int = color.black) -> None:
+    def __init__(self, board: Board, model, color: int = color.black, depth: int = AI_SEARCH_DEPTH, nodes: int = 0, tt: TranspositionTable | None = None,
+                 time_control: TimeControl | None = None) -> None:
+        """
+        depth, nodes and time_control limit the search like for the heuristics player. tt should not be shared with players
+        of another evaluation, the scores stored there would not compare.
+        """
         super().__init__(board, color)
         self.model = model
+        self.tensor_buffer = np.empty((MAX_MOVES, 8, 8, 17), dtype=np.int8) # Network input, reused between moves
+        self.evaluations = {} # Network evaluations of the current search by position hash
+        self.search = Search(board, self.evaluate_position, depth, nodes, tt, time_control=time_control)
     
-    def fen_to_tensor(self, fen: str) -> np.ndarray:
-        """Convert a FEN-like string to a (8, 8, 17) tensor for CNN input."""
-        values = list(map(int, fen[1:-1].split(",")))
-        assert len(values) == 69, f"Expected 69 values (64 board + 4 castling + 1 ep), got {len(values)}"
-
-        board_flat = values[:64]
-        castling = values[64:68]
-        ep_square = values[68]
-
-        tensor = np.zeros((8, 8, 17), dtype=np.int8)
-
-        # Piece planes (1–12)
-        for i, val in enumerate(board_flat):
-            if val == 0:
-                continue
-            plane = val - 1  # piece IDs are 1–12
-            row, col = divmod(i, 8)
-            tensor[row, col, plane] = 1
-
-        # Castling planes (planes 12–15): broadcast across the whole 8x8 grid
-        for i, right in enumerate(castling):
-            tensor[:, :, 12 + i] = right
-
-        # En passant plane (16)
-        if ep_square != 0:
-            row, col = divmod(ep_square, 8)
-            tensor[row, col, 16] = 1
-
-        return tensor
-
     def make_player_move(self) -> int | None:
         """
         Make a move using the AI model.
-        This method generates all possible moves, evaluates them using the AI model,
-        and selects the best move based on the evaluation scores.
+        The positions after each legal move are evaluated by the model in one batch, then a search over
+        `evaluate_position` picks the move, with a quiescence search over the captures and promotions
+        so a capture is only judged once the exchange is over.
         """
-        all_moves = self.board.generate_moves()
-        if not all_moves:
+        moves_to_evaluate = self.board.generate_legal_moves()
+        if not moves_to_evaluate:  # No valid moves
             return None
 
-        fens = []
-        moves_to_evaluate = []
-        for move in all_moves:
-            restore = self.board.copy_board()
-            result = self.board.make_move(move)
-            if result:
-                fens.append(self.board.to_scoreboard_array())
-                moves_to_evaluate.append(move)
-                self.board.restore_board(*restore)  # Restore *after* appending
-            else:
-                # if a move is invalid, don't add it to list.
-                pass
+        snapshots = []
+        keys = []
+        for move in moves_to_evaluate:
+            self.board.make_move(move, is_legal=True)
+            snapshots.append(self.board.copy_board())
+            keys.append(self.board.hash)
+            self.board.unmake_move(move)  # Unmake *after* appending
 
-        if not fens:  # No valid moves
-            return None
-
-        tensors = np.array([self.fen_to_tensor(fen) for fen in fens])
+        tensors = snapshots_to_tensors(snapshots, self.tensor_buffer[:len(snapshots)])
         evaluations = self.model.predict(tensors, verbose=0).flatten()  # Get all evals at once
+        for key, snapshot, evaluation in zip(keys, snapshots, evaluations):
+            self.evaluations[key] = self.to_score(evaluation, snapshot[12] & 1)
 
-        moves_with_evaluations = list(zip(moves_to_evaluate, evaluations))
-        moves_with_evaluations.sort(key=lambda x: x[1], reverse=True) # Sort by the evaluation
-
-        for move, _ in moves_with_evaluations:
-            status = self.board.make_move(move)
-            if status:
-                return move
-        return None
+        move = self.search.search()
+        self.evaluations.clear()
+        if not move:
+            return None
+        
+        self.board.make_move(move, is_legal=True)
+        return move
+    
+    def evaluate_position(self) -> int:
+        """
+        Evaluates the current position with the model, from the point of view of the side to move.
+        Positions of the root batch are looked up, the ones the quiescence search reaches are evaluated one at a time.
+        """
+        key = self.board.hash
+        score = self.evaluations.get(key)
+        if score is None:
+            tensors = snapshots_to_tensors([self.board.copy_board()], self.tensor_buffer[:1])
+            score = self.to_score(float(self.model(tensors, training=False)[0][0]), self.board.turn)
+            self.evaluations[key] = score
+        return score
+    
+    @staticmethod
+    def to_score(evaluation: float, turn: int) -> int:
+        """
+        The model rates positions for black from 0 to 1, convert its evaluation to an integer score for the side to move.
+        The score is centred on 0.5, so draws (stalemate, fifty move rule), which the search scores 0, rank as an even position.
+        """
+        score = round((float(evaluation) - 0.5) * 2 * NN_SCORE_SCALE)
+        return score if turn == color.black else -score
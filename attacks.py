@@ -60,8 +60,8 @@ def mask_king_attacks(square: int) -> int:
     
     return attacks
 
-def init_leapers_attacks() -> tuple[list[list[int]], list[int], list[int]]:
-    """Initialize the attacks bitboards for pawns, knights and kings."""
+def init_leapers_attacks() -> tuple[tuple[tuple[int, ...], ...], tuple[int, ...], tuple[int, ...]]:
+    """Initialize the attacks bitboards for pawns, knights and kings. The tables are returned as tuples, since they are shared and never written to."""
     pawn_attacks = [[0] * 64 for _ in range(2)] # [color][square] (2)(64)
     knight_attacks = [0 for _ in range(64)] # [square] (64)
     king_attacks = [0 for _ in range(64)] # [square] (64)
@@ -73,7 +73,7 @@ def init_leapers_attacks() -> tuple[list[list[int]], list[int], list[int]]:
         
         king_attacks[square] = mask_king_attacks(square)
     
-    return pawn_attacks, knight_attacks, king_attacks
+    return tuple(tuple(attacks) for attacks in pawn_attacks), tuple(knight_attacks), tuple(king_attacks)
 
 def mask_bishop_attacks(square: int) -> int:
     """Calculate the attacks from a bishop at the given square."""
@@ -177,33 +177,52 @@ def set_occupancy(index: int, bits_in_mask: int, attack_mask: int) -> int:
         
     return occupancy
 
+def init_rays() -> tuple[list[list[int]], list[list[int]]]:
+    """Initialize the between and line bitboards for every pair of squares.
+    between_squares[a][b] holds the squares strictly between a and b, line_squares[a][b] holds the
+    whole line (rank, file or diagonal) passing through both squares. Both are empty if a and b are not aligned."""
+    between_squares = [[0] * 64 for _ in range(64)] # [square][square] (64)(64)
+    line_squares = [[0] * 64 for _ in range(64)] # [square][square] (64)(64)
+    
+    for source in range(64):
+        bishop_rays = generate_bishop_attacks_on_the_fly(source, 0)
+        rook_rays = generate_rook_attacks_on_the_fly(source, 0)
+        for target in range(64):
+            if get_bit(bishop_rays, target):
+                line_squares[source][target] = (bishop_rays & generate_bishop_attacks_on_the_fly(target, 0)) | (1 << source) | (1 << target)
+                between_squares[source][target] = generate_bishop_attacks_on_the_fly(source, 1 << target) & generate_bishop_attacks_on_the_fly(target, 1 << source)
+            elif get_bit(rook_rays, target):
+                line_squares[source][target] = (rook_rays & generate_rook_attacks_on_the_fly(target, 0)) | (1 << source) | (1 << target)
+                between_squares[source][target] = generate_rook_attacks_on_the_fly(source, 1 << target) & generate_rook_attacks_on_the_fly(target, 1 << source)
+    
+    return between_squares, line_squares
+
+pawn_attacks, knight_attacks, king_attacks = init_leapers_attacks() # Shared by every Board
+between_squares, line_squares = init_rays()
+
 import magics
 
-bishop_masks, rook_masks, bishop_attacks, rook_attacks = magics.init_sliding_attacks()
+bishop_masks, rook_masks, bishop_attacks, rook_attacks = magics.load_sliding_attacks()
+bishop_offsets, rook_offsets = magics.bishop_offsets, magics.rook_offsets
+bishop_shifts = [64 - bits for bits in bishop_relevant_bits]
+rook_shifts = [64 - bits for bits in rook_relevant_bits]
 
 def get_bishop_attacks(square: int, occupancy: int) -> int:
     """Get the bishop attacks for a given square and occupancy."""
-    # Mask occupancy with bishop mask
-    occupancy &= bishop_masks[square]
-    # Multiply by magic number and mask to 64 bits
-    occupancy = (occupancy * bishop_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF
-    # Shift to get the attack index
-    occupancy >>= 64 - bishop_relevant_bits[square]
-    # Return the precomputed attacks
-    return bishop_attacks[square][occupancy]
+    # Mask occupancy with bishop mask, multiply by magic number, mask to 64 bits and shift to get the attack index
+    index = (((occupancy & bishop_masks[square]) * bishop_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_shifts[square]
+    # Return the precomputed attacks from the square's slice of the table
+    return bishop_attacks[bishop_offsets[square] + index]
 
 def get_rook_attacks(square: int, occupancy: int) -> int:
     """Get the rook attacks for a given square and occupancy."""
-    # Mask occupancy with rook mask
-    occupancy &= rook_masks[square]
-    # Multiply by magic number and mask to 64 bits
-    occupancy = (occupancy * rook_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF
-    # Shift to get the attack index
-    occupancy >>= 64 - rook_relevant_bits[square]
-    # Return the precomputed attacks
-    return rook_attacks[square][occupancy]
+    # Mask occupancy with rook mask, multiply by magic number, mask to 64 bits and shift to get the attack index
+    index = (((occupancy & rook_masks[square]) * rook_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> rook_shifts[square]
+    # Return the precomputed attacks from the square's slice of the table
+    return rook_attacks[rook_offsets[square] + index]
 
 def get_queen_attacks(square: int, occupancy: int) -> int:
-    """Get the queen attacks for a given square and occupancy."""
-    return get_bishop_attacks(square, occupancy) | get_rook_attacks(square, occupancy)
-
+    """Get the queen attacks for a given square and occupancy, looking up both tables inline on the same occupancy."""
+    bishop_index = (((occupancy & bishop_masks[square]) * bishop_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_shifts[square]
+    rook_index = (((occupancy & rook_masks[square]) * rook_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> rook_shifts[square]
+    return bishop_attacks[bishop_offsets[square] + bishop_index] | rook_attacks[rook_offsets[square] + rook_index]
@@ -0,0 +1,173 @@
+import json
+import platform
+import sys
+import time
+from board import Board
+from headers import *
+from heuristics_player import HeuristicsPlayer
+from perft import perft_driver
+from transposition import SharedTranspositionTable
+
+# Benchmark positions: name, FEN, depth and the expected perft node count at that depth
+bench_positions: Final = [
+    ("start", START_POSITION, 4, 197281),
+    ("tricky", TRICKY_POSITION, 3, 97862),
+    ("killer", KILLER_POSITION, 3, 39518),
+    ("cmk", CMK_POSITION, 3, 54240),
+    ("position 3", PERFT_POSITION_3, 5, 674624),
+    ("position 4", PERFT_POSITION_4, 4, 422333),
+    ("position 5", PERFT_POSITION_5, 3, 62379),
+    ("position 6", PERFT_POSITION_6, 3, 89890),
+]
+
+def run_bench(positions: list[tuple[str, str, int, int]] = bench_positions, repeats: int = BENCH_REPEATS, min_time: float = BENCH_MIN_TIME) -> dict:
+    """
+    Runs a perft on every benchmark position and returns the results:
+    nodes, expected nodes, wall time and nodes per second for each position, and the totals.
+    Each position is run at least repeats times and for at least min_time seconds in all, and its fastest run is kept,
+    so a short position isn't judged on a single noisy timing.
+    """
+    results = []
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, depth, expected in positions:
+        board = Board(fen)
+        runs = 0
+        spent = 0.0
+        elapsed = float("inf")
+        while runs < repeats or spent < min_time:
+            start = time.perf_counter()
+            nodes = perft_driver(board, depth)
+            run_time = time.perf_counter() - start
+            elapsed = min(elapsed, run_time)
+            spent += run_time
+            runs += 1
+
+        results.append({
+            "name": name,
+            "fen": fen,
+            "depth": depth,
+            "nodes": nodes,
+            "expected": expected,
+            "time": elapsed,
+            "runs": runs,
+            "nps": nodes / elapsed if elapsed > 0 else 0.0,
+        })
+        total_nodes += nodes
+        total_time += elapsed
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "positions": results,
+        "nodes": total_nodes,
+        "time": total_time,
+        "nps": total_nodes / total_time if total_time > 0 else 0.0,
+    }
+
+def compare_bench(results: dict, baseline: dict | None = None, threshold: float = BENCH_REGRESSION_THRESHOLD) -> list[str]:
+    """
+    Checks the benchmark results and returns a list of failures, empty if everything passed.
+    A position fails if its node count differs from the expected count. The benchmark fails if the total
+    nodes per second dropped by more than threshold (a fraction) compared to the baseline results, when both
+    ran the same positions at the same depths. The nodes per second of each position are only shown, see `print_bench`,
+    the short ones vary too much between runs to gate on.
+    """
+    failures = []
+    for result in results["positions"]:
+        if result["nodes"] != result["expected"]:
+            failures.append(f"{result['name']}: {result['nodes']} nodes, expected {result['expected']}")
+
+    same_positions = baseline and [(result["name"], result["depth"]) for result in baseline["positions"]] == \
+                                  [(result["name"], result["depth"]) for result in results["positions"]]
+    if same_positions and results["nps"] < baseline["nps"] * (1 - threshold):
+        failures.append(f"total: {results['nps']:,.0f} nps, baseline {baseline['nps']:,.0f} nps")
+
+    return failures
+
+def print_bench(results: dict, baseline: dict | None = None) -> None:
+    """Prints the benchmark results as a table, with the change in nodes per second against the baseline if one is given."""
+    baseline_positions = {result["name"]: result for result in baseline["positions"]} if baseline else {}
+
+    def change(result: dict, base: dict | None) -> str:
+        return f"{(result['nps'] / base['nps'] - 1) * 100:+.1f}%" if base and base["nps"] else ""
+
+    print(f"{'position':<12} {'depth':>5} {'nodes':>10} {'time':>8} {'nps':>10} {'change':>8}")
+    for result in results["positions"]:
+        base = baseline_positions.get(result["name"])
+        print(f"{result['name']:<12} {result['depth']:>5} {result['nodes']:>10,} {result['time']:>7.2f}s {result['nps']:>10,.0f} {change(result, base):>8}")
+    print(f"{'total':<12} {'':>5} {results['nodes']:>10,} {results['time']:>7.2f}s {results['nps']:>10,.0f} {change(results, baseline):>8}")
+
+def bench(output_path: str = BENCH_OUTPUT_PATH, baseline_path: str | None = None, threshold: float = BENCH_REGRESSION_THRESHOLD) -> bool:
+    """
+    Runs the benchmark suite, prints the results, writes them as JSON to output_path
+    and compares them with the baseline results file if one is given. Returns whether the benchmark passed.
+    """
+    baseline = None
+    if baseline_path:
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+
+    results = run_bench()
+    print_bench(results, baseline)
+
+    with open(output_path, "w") as file:
+        json.dump(results, file, indent=4)
+
+    failures = compare_bench(results, baseline, threshold)
+    for failure in failures:
+        print(f"FAILED {failure}")
+
+    return not failures
+
+def run_smp_bench(depth: int = SMP_BENCH_DEPTH, workers: tuple[int, ...] = SMP_BENCH_WORKERS,
+                  positions: list[tuple[str, str, int, int]] = bench_positions) -> dict:
+    """
+    Measures the time to depth of the parallel heuristics search: every benchmark position is searched to the given depth
+    with each worker count, on a fresh shared transposition table. Returns the time and the main search nodes
+    of every position and worker count, the total time of each worker count and its speedup over the first one.
+    """
+    results = {"depth": depth, "workers": list(workers), "positions": [], "time": {}, "speedup": {}}
+    for name, fen, _, _ in positions:
+        result = {"name": name, "time": {}, "nodes": {}}
+        for count in workers:
+            board = Board(fen)
+            tt = SharedTranspositionTable()
+            player = HeuristicsPlayer(board, board.turn, depth, tt=tt, workers=count)
+            if count > 1:
+                player.search.start_helpers() # Not timed
+            start = time.perf_counter()
+            player.search.search()
+            result["time"][count] = time.perf_counter() - start
+            result["nodes"][count] = player.search.nodes
+            if count > 1:
+                player.search.close()
+            tt.close()
+        results["positions"].append(result)
+
+    for count in workers:
+        results["time"][count] = sum(result["time"][count] for result in results["positions"])
+        results["speedup"][count] = results["time"][workers[0]] / results["time"][count]
+    return results
+
+def print_smp_bench(results: dict) -> None:
+    """Prints the parallel search benchmark results as a table of time to depth per worker count."""
+    workers = results["workers"]
+    print(f"Time to depth {results['depth']}, main search nodes in parentheses")
+    print(f"{'position':<12}" + "".join(f"{f'{count} workers':>22}" for count in workers))
+    for result in results["positions"]:
+        print(f"{result['name']:<12}" + "".join(f"{result['time'][count]:>11.2f}s ({result['nodes'][count]:>7,})" for count in workers))
+    print(f"{'total':<12}" + "".join(f"{results['time'][count]:>21.2f}s" for count in workers))
+    print(f"{'speedup':<12}" + "".join(f"{results['speedup'][count]:>21.2f}x" for count in workers))
+
+def smp_bench(depth: int = SMP_BENCH_DEPTH, workers: tuple[int, ...] = SMP_BENCH_WORKERS) -> dict:
+    """Runs the parallel search benchmark and prints its results."""
+    results = run_smp_bench(depth, workers)
+    print_smp_bench(results)
+    return results
+
+if __name__ == "__main__":
+    # bench.py [baseline_path] [output_path], exits with 1 on a failure so CI can run it directly
+    baseline_path = sys.argv[1] if len(sys.argv) > 1 else None
+    output_path = sys.argv[2] if len(sys.argv) > 2 else BENCH_OUTPUT_PATH
+    sys.exit(0 if bench(output_path, baseline_path) else 1)
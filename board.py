@@ -1,27 +1,33 @@
 import bit
 from headers import *
 from bit import *
-from attacks import init_leapers_attacks, get_bishop_attacks, get_rook_attacks, get_queen_attacks
+from attacks import pawn_attacks, knight_attacks, king_attacks, get_bishop_attacks, get_rook_attacks, get_queen_attacks, between_squares, line_squares
 from magics import *
 from move import *
+from move_list import MoveList
+from zobrist import piece_keys, castle_keys, en_passant_keys, side_key
 import re
 
 class Board:
+    __slots__ = (
+        "bitboards", "occupancies", "mailbox",
+        "turn", "castle", "en_passant", "halfmove", "fullmove", "hash",
+        "undo_stack", "attacks_cache",
+    )
+    
     def __init__(self, starting_fen: str = START_POSITION) -> None:
-        self.pawn_attacks, self.knight_attacks, self.king_attacks = init_leapers_attacks()
         self.parse_fen(starting_fen)
     
+    def piece_at(self, square: int) -> int:
+        """Return the piece on the given square, or -1 if the square is empty."""
+        return self.mailbox[square]
+    
     def print_board(self) -> None:
         """Prints the current state of the chess board, including piece positions and game status."""
         for rank in range(7, -1, -1):
             print(f"{rank + 1} ", end="")
             for file in range(8):
-                square = rank * 8 + file
-                piece = -1
-                for i in range(12):
-                    if get_bit(self.bitboards[i], square):
-                        piece = i
-                        break
+                piece = self.mailbox[rank * 8 + file]
                 if piece == -1:
                     print(".", end=" ")
                 else:
@@ -46,150 +52,253 @@ class Board:
                 
         print(f"  Castle: {castle_str}\n")
    
-    def copy_board(self) -> tuple[list[int], list[int], int, int, int, int, int]:
-        """Creates and returns a copy of the current board state."""
-        bitboards_copy = self.bitboards.copy()
-        occupancies_copy = self.occupancies.copy()
-        turn_copy = self.turn  
-        castle_copy = self.castle
-        en_passant_copy = self.en_passant
-        halfmove_copy = self.halfmove
-        fullmove_copy = self.fullmove
-        
-        return (bitboards_copy, occupancies_copy, turn_copy, castle_copy, en_passant_copy, halfmove_copy, fullmove_copy)
+    def copy_board(self) -> tuple[int, ...]:
+        """
+        Creates and returns a snapshot of the current board state as an immutable tuple of ints:
+        the 12 piece bitboards, the packed flags and the Zobrist key. The flags hold the turn (bit 0),
+        the castling rights (bits 1-4), the en passant square + 1 (bits 5-11, 0 for none),
+        the halfmove clock (bits 12-21) and the fullmove number (bits 22 and up).
+        Being immutable, a snapshot can be shared by reference, hashed or sent to another process as is.
+        """
+        flags = self.turn | (self.castle << 1) | ((self.en_passant + 1) << 5) | (self.halfmove << 12) | (self.fullmove << 22)
+        return (*self.bitboards, flags, self.hash)
+    
+    def restore_board(self, state: tuple[int, ...]) -> None:
+        """Restores the board state from a snapshot made by `copy_board`. The undo stack is cleared, since its moves belong to another position."""
+        bitboards = list(state[:12])
+        flags = state[12]
+        
+        # Rebuild the occupancies and the mailbox from the bitboards
+        occupancies = [0, 0, 0]
+        mailbox = [-1] * 64
+        for piece_type in range(12):
+            bitboard = bitboards[piece_type]
+            occupancies[piece_type // 6] |= bitboard
+            while bitboard:
+                mailbox[get_ls1b_index(bitboard)] = piece_type
+                bitboard &= bitboard - 1
+        occupancies[color.both] = occupancies[color.white] | occupancies[color.black]
+        
+        self.bitboards = bitboards
+        self.occupancies = occupancies
+        self.mailbox = mailbox
+        self.turn = flags & 1
+        self.castle = (flags >> 1) & 15
+        self.en_passant = ((flags >> 5) & 127) - 1
+        self.halfmove = (flags >> 12) & 1023
+        self.fullmove = flags >> 22
+        self.hash = state[13]
+        self.undo_stack = []
+        self.attacks_cache = [None, None]
     
-    def restore_board(self, bitboards_copy, occupancies_copy, turn_copy, castle_copy, en_passant_copy, halfmove_copy, fullmove_copy) -> None:
-        """Restores the board state from the provided copies of attributes."""
-        self.bitboards = bitboards_copy.copy()
-        self.occupancies = occupancies_copy.copy()
-        self.turn = turn_copy
-        self.castle = castle_copy
-        self.en_passant = en_passant_copy
-        self.halfmove = halfmove_copy
-        self.fullmove = fullmove_copy
+    def clone(self) -> "Board":
+        """Return an independent copy of the board, undo stack included."""
+        board = Board.__new__(Board)
+        board.bitboards = self.bitboards.copy()
+        board.occupancies = self.occupancies.copy()
+        board.mailbox = self.mailbox.copy()
+        board.turn = self.turn
+        board.castle = self.castle
+        board.en_passant = self.en_passant
+        board.halfmove = self.halfmove
+        board.fullmove = self.fullmove
+        board.hash = self.hash
+        board.undo_stack = self.undo_stack.copy()
+        board.attacks_cache = self.attacks_cache.copy()
+        return board
     
     def parse_fen(self, FEN: str) -> None:
-        """Parses a FEN string into the current board state. The FEN string should contain all information about the board state, including the piece positions, turn, en passant target, and castling rights."""
-        # Reset board state
-        self.bitboards = [0 for _ in range(12)]
-        self.occupancies = [0 for _ in range(3)]
-        self.en_passant = square.no_sq
-        self.castle = 0
-        
-        # Split FEN string into components
+        """
+        Parses a FEN string into the current board state. The FEN string should contain all information about the board state,
+        including the piece positions, turn, en passant target, and castling rights. The halfmove and fullmove clocks may be left out (0 and 1).
+        The string is validated while it is parsed, in a single pass, and a ValueError is raised if it is not a valid FEN
+        or if the side not to move is in check, which would let the side to move capture the king.
+        """
         parts = FEN.split()
-        board_part, turn_part, castle_part, en_passant_part, halfmove, fullmove = parts[:6]
+        if len(parts) == 4:
+            parts += ("0", "1")
+        if len(parts) != 6:
+            raise ValueError(f"FEN must have 4 or 6 fields: {FEN!r}")
+        board_part, turn_part, castle_part, en_passant_part, halfmove_part, fullmove_part = parts
         
-        # Parse board position
+        bitboards = [0] * 12
+        mailbox = [-1] * 64
+        key = 0
+        
+        # Parse board position, from a8 to h1
         rank, file = 7, 0
         for char in board_part:
-            if char == '/':
+            piece_type = char_pieces.get(char)
+            if piece_type is not None:
+                if file > 7:
+                    raise ValueError(f"FEN rank {rank + 1} has more than 8 squares: {FEN!r}")
+                square_index = rank * 8 + file
+                bitboards[piece_type] |= 1 << square_index
+                mailbox[square_index] = piece_type
+                key ^= piece_keys[piece_type][square_index]
+                file += 1
+            elif char == '/':
+                if file != 8 or rank == 0:
+                    raise ValueError(f"FEN rank {rank + 1} does not have 8 squares: {FEN!r}")
                 rank -= 1
                 file = 0
-            elif char.isdigit():
-                file += int(char)
+            elif '1' <= char <= '8':
+                file += ord(char) - 48
+                if file > 8:
+                    raise ValueError(f"FEN rank {rank + 1} has more than 8 squares: {FEN!r}")
             else:
-                piece_type = char_pieces[char]
-                square_index = rank * 8 + file
-                self.bitboards[piece_type] = set_bit(self.bitboards[piece_type], square_index)
-                file += 1
+                raise ValueError(f"Invalid character {char!r} in FEN board: {FEN!r}")
+        if rank != 0 or file != 8:
+            raise ValueError(f"FEN board does not have 8 full ranks: {FEN!r}")
+        # The move generators look for the king of the side to move
+        if bitboards[piece.K].bit_count() != 1 or bitboards[piece.k].bit_count() != 1:
+            raise ValueError(f"FEN board must have exactly one king per side: {FEN!r}")
         
         # Parse turn
-        self.turn = color.white if turn_part == 'w' else color.black
+        if turn_part == 'w':
+            turn = color.white
+        elif turn_part == 'b':
+            turn = color.black
+            key ^= side_key
+        else:
+            raise ValueError(f"Invalid FEN side to move {turn_part!r}")
         
         # Parse castling rights
+        castle_rights = 0
         if castle_part != '-':
             for char in castle_part:
-                if char == 'K': self.castle |= castle.wk
-                elif char == 'Q': self.castle |= castle.wq
-                elif char == 'k': self.castle |= castle.bk
-                elif char == 'q': self.castle |= castle.bq
+                right = char_castling_rights.get(char)
+                if right is None or castle_rights & right:
+                    raise ValueError(f"Invalid FEN castling rights {castle_part!r}")
+                castle_rights |= right
+        key ^= castle_keys[castle_rights]
         
         # Parse en passant square
+        en_passant = square.no_sq
         if en_passant_part != '-':
-            file, rank = ord(en_passant_part[0]) - ord('a'), int(en_passant_part[1]) - 1
-            self.en_passant = rank * 8 + file
+            if len(en_passant_part) != 2 or not 'a' <= en_passant_part[0] <= 'h' or en_passant_part[1] not in '36':
+                raise ValueError(f"Invalid FEN en passant square {en_passant_part!r}")
+            en_passant = (ord(en_passant_part[1]) - 49) * 8 + ord(en_passant_part[0]) - 97
+            key ^= en_passant_keys[en_passant]
         
-        # Update occupancies
-        for piece in range(12):
-            self.occupancies[color.white] |= self.bitboards[piece] if piece < 6 else 0
-            self.occupancies[color.black] |= self.bitboards[piece] if piece >= 6 else 0
-        self.occupancies[color.both] = self.occupancies[color.white] | self.occupancies[color.black]
-        
-        # Update clocks
-        self.halfmove = int(halfmove)
-        self.fullmove = int(fullmove)
+        # Parse clocks
+        if not halfmove_part.isdigit() or not fullmove_part.isdigit() or int(halfmove_part) > MAX_HALFMOVE or int(fullmove_part) < 1:
+            raise ValueError(f"Invalid FEN clocks {halfmove_part!r} {fullmove_part!r}")
+        
+        # Everything is valid, set the board state
+        white = bitboards[piece.P] | bitboards[piece.N] | bitboards[piece.B] | bitboards[piece.R] | bitboards[piece.Q] | bitboards[piece.K]
+        black = bitboards[piece.p] | bitboards[piece.n] | bitboards[piece.b] | bitboards[piece.r] | bitboards[piece.q] | bitboards[piece.k]
+        self.bitboards = bitboards
+        self.occupancies = [white, black, white | black]
+        self.mailbox = mailbox
+        self.turn = turn
+        self.castle = castle_rights
+        self.en_passant = en_passant
+        self.halfmove = int(halfmove_part)
+        self.fullmove = int(fullmove_part)
+        self.hash = key
+        self.undo_stack = []
+        self.attacks_cache = [None, None] # Attacked squares bitboard per side, see `attacks_by`
+        if self.is_king_in_check(turn ^ 1):
+            raise ValueError(f"FEN side not to move is in check: {FEN!r}")
     
     @staticmethod
     def validate_fen(fen: str) -> bool:
-        """Validates a FEN string."""
-        parts = fen.split()
-        if len(parts) != 6:
+        """Validates a FEN string, by parsing it."""
+        try:
+            Board(fen)
+        except ValueError:
             return False
-
-        board_part, turn_part, castle_part, en_passant_part, halfmove_part, fullmove_part = parts
-
-        # Validate board part
-        ranks = board_part.split('/')
-        if len(ranks) != 8:
-            return False
-        for rank in ranks:
-            file_count = 0
-            for char in rank:
-                if char.isdigit():
-                    file_count += int(char)
-                elif char in 'PNBRQKpnbrqk':
-                    file_count += 1
-                else:
-                    return False
-            if file_count != 8:
-                return False
-
-        # Validate turn part
-        if turn_part not in ('w', 'b'):
-            return False
-
-        # Validate castle part
-        if castle_part != '-':
-            for char in castle_part:
-                if char not in 'KQkq':
-                    return False
-
-        # Validate en passant part
-        if en_passant_part != '-':
-            if len(en_passant_part) != 2:
-                return False
-            file, rank = en_passant_part
-            if file not in 'abcdefgh' or rank not in '123456':
-                return False
-
-        # Validate halfmove part
-        if not halfmove_part.isdigit():
-            return False
-        if int(halfmove_part) < 0:
-            return False
-
-        # Validate fullmove part
-        if not fullmove_part.isdigit():
-            return False
-        if int(fullmove_part) < 1:
-            return False
-
         return True
+    
+    def to_fen(self) -> str:
+        """Returns the FEN string of the current board state, side to move and clocks included."""
+        mailbox = self.mailbox
+        ranks = []
+        for rank in range(56, -1, -8):
+            row = ""
+            empty = 0
+            for piece_type in mailbox[rank:rank + 8]:
+                if piece_type == -1:
+                    empty += 1
+                else:
+                    if empty:
+                        row += str(empty)
+                        empty = 0
+                    row += ascii_pieces[piece_type]
+            if empty:
+                row += str(empty)
+            ranks.append(row)
+        
+        castle_rights = self.castle
+        castle_str = "".join(char for char, right in char_castling_rights.items() if castle_rights & right) or "-"
+        en_passant_str = square_to_coordinates[self.en_passant] if self.en_passant != square.no_sq else "-"
+        
+        return f"{'/'.join(ranks)} {'wb'[self.turn]} {castle_str} {en_passant_str} {self.halfmove} {self.fullmove}"
 
+    def encode_position(self) -> bytes:
+        """
+        Encodes the position in POSITION_SIZE (34) bytes, used as the database key and the model input format.
+        Bytes 0-31 hold the 64 squares at 4 bits each, square 2i in the low half of byte i and square 2i+1 in the high half,
+        as the piece + 1 (0 for an empty square). Byte 32 holds the side to move (bit 0) and the castling rights (bits 1-4),
+        and byte 33 holds the en passant square + 1 (0 for none). The clocks are not part of the encoding.
+        """
+        mailbox = self.mailbox
+        data = bytearray(POSITION_SIZE)
+        for index in range(32):
+            data[index] = (mailbox[2 * index] + 1) | ((mailbox[2 * index + 1] + 1) << 4)
+        data[32] = self.turn | (self.castle << 1)
+        data[33] = self.en_passant + 1
+        return bytes(data)
+    
+    def decode_position(self, data: bytes) -> None:
+        """Sets the board to a position encoded by `encode_position`. The clocks are reset to 0 and 1."""
+        if len(data) != POSITION_SIZE:
+            raise ValueError(f"Encoded position must be {POSITION_SIZE} bytes, got {len(data)}")
+        
+        bitboards = [0] * 12
+        mailbox = [-1] * 64
+        key = 0
+        for index in range(64):
+            piece_type = ((data[index >> 1] >> ((index & 1) << 2)) & 15) - 1
+            if piece_type >= 0:
+                if piece_type > piece.k:
+                    raise ValueError(f"Invalid piece code {piece_type + 1} on square {square_to_coordinates[index]}")
+                bitboards[piece_type] |= 1 << index
+                mailbox[index] = piece_type
+                key ^= piece_keys[piece_type][index]
+        
+        if bitboards[piece.K].bit_count() != 1 or bitboards[piece.k].bit_count() != 1:
+            raise ValueError("Encoded position must have exactly one king per side")
+        
+        turn = data[32] & 1
+        castle_rights = (data[32] >> 1) & 15
+        en_passant = data[33] - 1
+        key ^= castle_keys[castle_rights]
+        if en_passant != square.no_sq:
+            key ^= en_passant_keys[en_passant]
+        if turn == color.black:
+            key ^= side_key
+        
+        white = bitboards[piece.P] | bitboards[piece.N] | bitboards[piece.B] | bitboards[piece.R] | bitboards[piece.Q] | bitboards[piece.K]
+        black = bitboards[piece.p] | bitboards[piece.n] | bitboards[piece.b] | bitboards[piece.r] | bitboards[piece.q] | bitboards[piece.k]
+        self.bitboards = bitboards
+        self.occupancies = [white, black, white | black]
+        self.mailbox = mailbox
+        self.turn = turn
+        self.castle = castle_rights
+        self.en_passant = en_passant
+        self.halfmove = 0
+        self.fullmove = 1
+        self.hash = key
+        self.undo_stack = []
+        self.attacks_cache = [None, None]
+        if self.is_king_in_check(turn ^ 1):
+            raise ValueError("Encoded position has the side not to move in check")
+    
     def to_scoreboard_array(self) -> str:
         """Converts the current board state to a scoreboard array."""
-        array = []
-        for rank in range(8):
-            for file in range(8):
-                # Get the piece at the square
-                square = rank * 8 + file
-                for piece in range(12):
-                    if get_bit(self.bitboards[piece], square):
-                        array.append(piece + 1) # 0 is Empty
-                        break
-                else:
-                    array.append(0)
+        array = [piece + 1 for piece in self.mailbox] # 0 is Empty
         
         # Castling
         array.append(1 if castle.wk & self.castle else 0)
@@ -203,9 +312,12 @@ class Board:
         return "[" + ",".join(map(str, array)) + "]"
     
     def from_scoreboard_array(self, scoreboard_str: str) -> str:
-        """Converts a scoreboard array string to a FEN string."""
-        # Parse the array string into integers
-        array = list(map(int, re.findall(r'\d+', scoreboard_str)))
+        """
+        Converts a scoreboard array string to a FEN string.
+        The array has no side to move or clocks, so white to move and 0 1 are assumed, use `to_fen` on a board to keep them.
+        """
+        # Parse the array string into integers, the en passant square is -1 when there is none
+        array = list(map(int, re.findall(r'-?\d+', scoreboard_str)))
         assert len(array) == 64 + 4 + 1, "Invalid scoreboard array length"
 
         piece_map = {
@@ -243,317 +355,508 @@ class Board:
 
         # En passant
         ep_square = array[68]
-        if ep_square == 0:
+        if ep_square == square.no_sq:
             ep_fen = '-'
         else:
-            file = ep_square % 8
-            rank = ep_square // 8
-            ep_fen = chr(ord('a') + file) + str(8 - rank)
+            ep_fen = square_to_coordinates[ep_square]
 
         # Assume it's always white's turn and halfmove/fullmove are 0
         return f"{board_fen} w {castling_fen} {ep_fen} 0 1"
       
     def is_square_attacked(self, square: int, side: int) -> bool:
         """Determine if a given square is attacked by any piece of the specified side."""
-
-        # Attacked by queens
-        if side == color.white and get_queen_attacks(square, self.occupancies[color.both]) & self.bitboards[piece.Q]: return True
-        if side == color.black and get_queen_attacks(square, self.occupancies[color.both]) & self.bitboards[piece.q]: return True
+        return self.get_attackers(square, side, self.occupancies[color.both]) != 0
+    
+    def get_attackers(self, square: int, side: int, occupancy: int) -> int:
+        """Return a bitboard of all pieces of the specified side attacking the given square, with sliding attacks blocked by the given occupancy."""
+        bitboards = self.bitboards
+        offset = 0 if side == color.white else 6
+        bishops_queens = bitboards[piece.B + offset] | bitboards[piece.Q + offset]
+        rooks_queens = bitboards[piece.R + offset] | bitboards[piece.Q + offset]
+        
+        return (pawn_attacks[side ^ 1][square] & bitboards[piece.P + offset]) | \
+               (knight_attacks[square] & bitboards[piece.N + offset]) | \
+               (king_attacks[square] & bitboards[piece.K + offset]) | \
+               (get_bishop_attacks(square, occupancy) & bishops_queens) | \
+               (get_rook_attacks(square, occupancy) & rooks_queens)
+    
+    def attacks_by(self, side: int) -> int:
+        """
+        Return a bitboard of all squares attacked by the given side.
+        Pawn attacks are computed set-wise by shifting, the other pieces with one lookup each.
+        The result is cached until the position changes, see `make_move` and `unmake_move`.
+        """
+        attacks = self.attacks_cache[side]
+        if attacks is not None:
+            return attacks
         
-        # Attacked by bishops
-        if side == color.white and get_bishop_attacks(square, self.occupancies[color.both]) & self.bitboards[piece.B]: return True
-        if side == color.black and get_bishop_attacks(square, self.occupancies[color.both]) & self.bitboards[piece.b]: return True
+        bitboards = self.bitboards
+        occupancy = self.occupancies[color.both]
+        offset = 0 if side == color.white else 6
         
-        # Attacked by rooks
-        if side == color.white and get_rook_attacks(square, self.occupancies[color.both]) & self.bitboards[piece.R]: return True
-        if side == color.black and get_rook_attacks(square, self.occupancies[color.both]) & self.bitboards[piece.r]: return True
+        # Pawns
+        pawns = bitboards[piece.P + offset]
+        if side == color.white:
+            attacks = (((pawns << 7) & NOT_H_FILE) | ((pawns << 9) & NOT_A_FILE)) & ALL_SQUARES
+        else:
+            attacks = ((pawns >> 9) & NOT_H_FILE) | ((pawns >> 7) & NOT_A_FILE)
         
-        # Attacked by knights
-        if side == color.white and self.knight_attacks[square] & self.bitboards[piece.N]: return True
-        if side == color.black and self.knight_attacks[square] & self.bitboards[piece.n]: return True
+        # Knights
+        bitboard = bitboards[piece.N + offset]
+        while bitboard:
+            attacks |= knight_attacks[get_ls1b_index(bitboard)]
+            bitboard &= bitboard - 1
+        
+        # Bishops and queens
+        bitboard = bitboards[piece.B + offset] | bitboards[piece.Q + offset]
+        while bitboard:
+            attacks |= get_bishop_attacks(get_ls1b_index(bitboard), occupancy)
+            bitboard &= bitboard - 1
         
-        # Attacked by kings
-        if side == color.white and self.king_attacks[square] & self.bitboards[piece.K]: return True
-        if side == color.black and self.king_attacks[square] & self.bitboards[piece.k]: return True
+        # Rooks and queens
+        bitboard = bitboards[piece.R + offset] | bitboards[piece.Q + offset]
+        while bitboard:
+            attacks |= get_rook_attacks(get_ls1b_index(bitboard), occupancy)
+            bitboard &= bitboard - 1
         
-        # Attacked by pawns
-        if side == color.white and self.pawn_attacks[color.black][square] & self.bitboards[piece.P]: return True
-        if side == color.black and self.pawn_attacks[color.white][square] & self.bitboards[piece.p]: return True
+        # King
+        king = bitboards[piece.K + offset]
+        if king:
+            attacks |= king_attacks[get_ls1b_index(king)]
         
-        return False
+        self.attacks_cache[side] = attacks
+        return attacks
     
     def print_attacked_squares(self, color: int) -> None:
-        """Print all squares attacked by the current player."""
-        bb = 0
-        for square in range(64):
-            if self.is_square_attacked(square, color):
-                bb = set_bit(bb, square)
-        
-        print_bitboard(bb)
+        """Print all squares attacked by the given side."""
+        print_bitboard(self.attacks_by(color))
 
-    def generate_pawn_moves(self, color: int) -> list[int]:
-        """Generate all pawn moves for the given color."""
-        if color == color.white:
-            pc = piece.P
+    def generate_pawn_moves(self, moves: list[int], count: int, side: int, pawns: int, target_mask: int, gen: int = gen_type.all) -> int:
+        """
+        Write the pushes, double pushes and captures of the given pawns into the move buffer from index count on,
+        and return the new count. Targets are computed set-wise by shifting the whole pawn bitboard, and only
+        targets inside target_mask are kept. Promotions count as captures for gen. En passant is left to the caller.
+        """
+        mailbox = self.mailbox
+        empty = ~self.occupancies[color.both] & ALL_SQUARES
+        enemy_occupancy = self.occupancies[side ^ 1] & target_mask
+        
+        if side == color.white:
+            pawn = piece.P
+            promotions = (piece.Q, piece.R, piece.B, piece.N)
+            promotion_rank = RANK_8
+            single_pushes = (pawns << 8) & empty
+            double_pushes = ((single_pushes & RANK_3) << 8) & empty & target_mask
+            left_captures = (pawns << 7) & NOT_H_FILE & enemy_occupancy
+            right_captures = (pawns << 9) & NOT_A_FILE & enemy_occupancy
+            push_offset, left_offset, right_offset = 8, 7, 9
         else:
-            pc = piece.p
+            pawn = piece.p
+            promotions = (piece.q, piece.r, piece.b, piece.n)
+            promotion_rank = RANK_1
+            single_pushes = (pawns >> 8) & empty
+            double_pushes = ((single_pushes & RANK_6) >> 8) & empty & target_mask
+            left_captures = (pawns >> 9) & NOT_H_FILE & enemy_occupancy
+            right_captures = (pawns >> 7) & NOT_A_FILE & enemy_occupancy
+            push_offset, left_offset, right_offset = -8, -9, -7
+        single_pushes &= target_mask
         
-        bitboard = self.bitboards[pc]
+        if gen == gen_type.captures:
+            single_pushes &= promotion_rank
+            double_pushes = 0
+        elif gen == gen_type.quiets:
+            single_pushes &= ~promotion_rank
+            left_captures = right_captures = 0
         
-        moves = []
-        while bitboard:
-            source_square = get_ls1b_index(bitboard)
-            if color == color.white:
-                target_square = source_square + 8
+        # Quiet moves and quiet promotions
+        while single_pushes:
+            target_square = get_ls1b_index(single_pushes)
+            source_square = target_square - push_offset
+            if get_bit(promotion_rank, target_square):
+                for promoted in promotions:
+                    moves[count] = encode_move(source_square, target_square, pawn, promoted, 0, 0, 0, 0)
+                    count += 1
             else:
-                target_square = source_square - 8
-            
-            # Quiet move
-            if not target_square < 0 and not get_bit(self.occupancies[color.both], target_square):
-                # Pawn promotion
-                q = piece.Q if color == color.white else piece.q
-                r = piece.R if color == color.white else piece.r
-                b = piece.B if color == color.white else piece.b
-                n = piece.N if color == color.white else piece.n
-                if (target_square // 8 == 7 and color == color.white) or (target_square // 8 == 0 and color == color.black):
-                    moves.append(encode_move(source_square, target_square, pc, q, 0, 0, 0, 0))
-                    moves.append(encode_move(source_square, target_square, pc, r, 0, 0, 0, 0))
-                    moves.append(encode_move(source_square, target_square, pc, b, 0, 0, 0, 0))
-                    moves.append(encode_move(source_square, target_square, pc, n, 0, 0, 0, 0))
+                moves[count] = encode_move(source_square, target_square, pawn, 0, 0, 0, 0, 0)
+                count += 1
+            single_pushes &= single_pushes - 1
+        
+        # Two square moves
+        while double_pushes:
+            target_square = get_ls1b_index(double_pushes)
+            moves[count] = encode_move(target_square - 2 * push_offset, target_square, pawn, 0, 0, 1, 0, 0)
+            count += 1
+            double_pushes &= double_pushes - 1
+        
+        # Captures and capture promotions
+        for captures, capture_offset in ((left_captures, left_offset), (right_captures, right_offset)):
+            while captures:
+                target_square = get_ls1b_index(captures)
+                source_square = target_square - capture_offset
+                victim = mailbox[target_square]
+                if get_bit(promotion_rank, target_square):
+                    for promoted in promotions:
+                        moves[count] = encode_move(source_square, target_square, pawn, promoted, 1, 0, 0, 0, victim)
+                        count += 1
                 else:
-                    # One square move
-                    moves.append(encode_move(source_square, target_square, pc, 0, 0, 0, 0, 0))
-                    # Two square move
-                    is_on_start = source_square // 8 == 1 if color == color.white else source_square // 8 == 6
-                    two_squares_target = target_square + 8 if color == color.white else target_square - 8
-                    if is_on_start and not get_bit(self.occupancies[color.both], two_squares_target):
-                        if color == color.white:
-                            moves.append(encode_move(source_square, target_square + 8, pc, 0, 0, 1, 0, 0))
-                        else:
-                            moves.append(encode_move(source_square, target_square - 8, pc, 0, 0, 1, 0, 0))
-            
-            # Pawn attacks
-            if color == color.white:
-                attacks = self.pawn_attacks[self.turn][source_square] & self.occupancies[color.black]
-            else:
-                attacks = self.pawn_attacks[self.turn][source_square] & self.occupancies[color.white]
-            while attacks:
-                target_square = get_ls1b_index(attacks)
-                
-                # Pawn promotion
-                if (target_square // 8 == 7 and color == color.white) or (target_square // 8 == 0 and color == color.black):
-                    moves.append(encode_move(source_square, target_square, pc, piece.Q, 1, 0, 0, 0))
-                    moves.append(encode_move(source_square, target_square, pc, piece.R, 1, 0, 0, 0))
-                    moves.append(encode_move(source_square, target_square, pc, piece.B, 1, 0, 0, 0))
-                    moves.append(encode_move(source_square, target_square, pc, piece.N, 1, 0, 0, 0))
+                    moves[count] = encode_move(source_square, target_square, pawn, 0, 1, 0, 0, 0, victim)
+                    count += 1
+                captures &= captures - 1
+        
+        return count
+    
+    def generate_piece_moves(self, moves: list[int], count: int, side: int, target_mask: int, pin_masks: dict[int, int]) -> int:
+        """
+        Write the knight, bishop, rook and queen moves of the given side into the move buffer from index count on,
+        and return the new count. Only targets inside target_mask are kept, and a piece found in pin_masks is further
+        restricted to its pin line.
+        """
+        bitboards = self.bitboards
+        mailbox = self.mailbox
+        offset = 0 if side == color.white else 6
+        occupancy = self.occupancies[color.both]
+        target_mask &= ~self.occupancies[side]
+        
+        for pc in range(piece.N + offset, piece.K + offset):
+            bitboard = bitboards[pc]
+            piece_type = pc - offset
+            while bitboard:
+                source_square = get_ls1b_index(bitboard)
+                if piece_type == piece.N:
+                    attacks = knight_attacks[source_square]
+                elif piece_type == piece.B:
+                    attacks = get_bishop_attacks(source_square, occupancy)
+                elif piece_type == piece.R:
+                    attacks = get_rook_attacks(source_square, occupancy)
                 else:
-                    moves.append(encode_move(source_square, target_square, pc, 0, 1, 0, 0, 0))                                
-                    
-                attacks = pop_bit(attacks, target_square)
-            
-            # En passant
-            if self.en_passant != square.no_sq:
-                # Check if the current pawn can capture the en passant square
-                enpassant_attacks = self.pawn_attacks[self.turn][source_square] & (1 << self.en_passant)
+                    attacks = get_queen_attacks(source_square, occupancy)
+                attacks &= target_mask
+                if pin_masks and source_square in pin_masks:
+                    attacks &= pin_masks[source_square]
                 
-                if enpassant_attacks:
-                    moves.append(encode_move(source_square, self.en_passant, pc, 0, 1, 0, 1, 0))
-            
-            bitboard = pop_bit(bitboard, source_square)
+                while attacks:
+                    target_square = get_ls1b_index(attacks)
+                    victim = mailbox[target_square]
+                    if victim == -1:
+                        moves[count] = encode_move(source_square, target_square, pc, 0, 0, 0, 0, 0)
+                        count += 1
+                    else:
+                        moves[count] = encode_move(source_square, target_square, pc, 0, 1, 0, 0, 0, victim)
+                        count += 1
+                    attacks &= attacks - 1
+                bitboard &= bitboard - 1
         
-        return moves
+        return count
     
-    def generate_castling_moves(self, color: int) -> list[int]:
-        moves = []
+    def generate_castling_moves(self, moves: list[int], count: int, side: int) -> int:
+        """Write the castling moves of the given side into the move buffer and return the new count. Landing in check is left for `make_move` to catch."""
+        occupancy = self.occupancies[color.both]
         
-        if color == color.white:
-            pc = piece.K
+        if side == color.white:
             if self.castle & castle.wk:
                 # Make sure that square between king and rook are empty
-                if not get_bit(self.occupancies[color.both], square.f1) and not get_bit(self.occupancies[color.both], square.g1):
+                if not get_bit(occupancy, square.f1) and not get_bit(occupancy, square.g1):
                     # Make sure king and the f1 squares are not attacked
-                    if not self.is_square_attacked(square.e1, color.black) and not self.is_square_attacked(square.f1, color.black):
-                        moves.append(encode_move(square.e1, square.g1, pc, 0, 0, 0, 0, 1))
+                    if not self.attacks_by(color.black) & ((1 << square.e1) | (1 << square.f1)):
+                        moves[count] = encode_move(square.e1, square.g1, piece.K, 0, 0, 0, 0, 1)
+                        count += 1
             if self.castle & castle.wq:
                 # Make sure that square between king and rook are empty
-                if not get_bit(self.occupancies[color.both], square.b1) and not get_bit(self.occupancies[color.both], square.c1) and not get_bit(self.occupancies[color.both], square.d1):
-                    # Make sure king and the d1, c1 squares are not attacked
-                    if not self.is_square_attacked(square.e1, color.black) and not self.is_square_attacked(square.d1, color.black):
-                        moves.append(encode_move(square.e1, square.c1, pc, 0, 0, 0, 0, 1))
+                if not get_bit(occupancy, square.b1) and not get_bit(occupancy, square.c1) and not get_bit(occupancy, square.d1):
+                    # Make sure king and the d1 squares are not attacked
+                    if not self.attacks_by(color.black) & ((1 << square.e1) | (1 << square.d1)):
+                        moves[count] = encode_move(square.e1, square.c1, piece.K, 0, 0, 0, 0, 1)
+                        count += 1
         else:
-            pc = piece.k
             if self.castle & castle.bk:
                 # Make sure that square between king and rook are empty
-                if not get_bit(self.occupancies[color.both], square.f8) and not get_bit(self.occupancies[color.both], square.g8):
-                    # Make sure king and the f1 squares are not attacked
-                    if not self.is_square_attacked(square.e8, color.white) and not self.is_square_attacked(square.f8, color.white):
-                        moves.append(encode_move(square.e8, square.g8, pc, 0, 0, 0, 0, 1))
+                if not get_bit(occupancy, square.f8) and not get_bit(occupancy, square.g8):
+                    # Make sure king and the f8 squares are not attacked
+                    if not self.attacks_by(color.white) & ((1 << square.e8) | (1 << square.f8)):
+                        moves[count] = encode_move(square.e8, square.g8, piece.k, 0, 0, 0, 0, 1)
+                        count += 1
             if self.castle & castle.bq:
                 # Make sure that square between king and rook are empty
-                if not get_bit(self.occupancies[color.both], square.b8) and not get_bit(self.occupancies[color.both], square.c8) and not get_bit(self.occupancies[color.both], square.d8):
-                    # Make sure king and the d1, c1 squares are not attacked
-                    if not self.is_square_attacked(square.e8, color.white) and not self.is_square_attacked(square.d8, color.white):
-                        moves.append(encode_move(square.e8, square.c8, pc, 0, 0, 0, 0, 1))
+                if not get_bit(occupancy, square.b8) and not get_bit(occupancy, square.c8) and not get_bit(occupancy, square.d8):
+                    # Make sure king and the d8 squares are not attacked
+                    if not self.attacks_by(color.white) & ((1 << square.e8) | (1 << square.d8)):
+                        moves[count] = encode_move(square.e8, square.c8, piece.k, 0, 0, 0, 0, 1)
+                        count += 1
         
-        return moves
-
-    def generate_knight_moves(self, pc: int) -> list[int]:
-        moves = []
-        bitboard = self.bitboards[pc]
-        if (self.turn == color.white and pc == piece.N) or (self.turn == color.black and pc == piece.n):
-            while bitboard:
-                source_square = get_ls1b_index(bitboard)
-                attacks = self.knight_attacks[source_square] & ~self.occupancies[self.turn]
-                while attacks:
-                    target_square = get_ls1b_index(attacks)
-                    
-                    # Quiet move
-                    if not get_bit(self.occupancies[color.both], target_square):
-                        moves.append(encode_move(source_square, target_square, pc, 0, 0, 0, 0, 0))
-                    else:
-                        moves.append(encode_move(source_square, target_square, pc, 0, 1, 0, 0, 0))                           
-                    attacks = pop_bit(attacks, target_square)
-                bitboard = pop_bit(bitboard, source_square)
-        
-        return moves
+        return count
     
-    def generate_bishop_moves(self, pc: int) -> list[int]:
-        moves = []
-        bitboard = self.bitboards[pc]
-        if (self.turn == color.white and pc == piece.B) or (self.turn == color.black and pc == piece.b):
-            while bitboard:
-                source_square = get_ls1b_index(bitboard)
-                attacks = get_bishop_attacks(source_square, self.occupancies[color.both]) & ~self.occupancies[self.turn]
-                while attacks:
-                    target_square = get_ls1b_index(attacks)
-                    
-                    # Quiet move
-                    if not get_bit(self.occupancies[color.both], target_square):
-                        moves.append(encode_move(source_square, target_square, pc, 0, 0, 0, 0, 0))  
-                    # Attack
-                    else:
-                        moves.append(encode_move(source_square, target_square, pc, 0, 1, 0, 0, 0)) 
-                    
-                    attacks = pop_bit(attacks, target_square)
-                bitboard = pop_bit(bitboard, source_square)
+    def generate_moves(self, move_list: MoveList | None = None) -> MoveList:
+        """
+        Generate all pseudo-legal moves for the current player.
+        Moves are written in a single pass over the side to move's six piece bitboards into one buffer,
+        which is move_list if given (e.g. a per-ply buffer) or a new one. Moves that leave the king
+        in check are rejected later by `make_move`.
+        """
+        if move_list is None:
+            move_list = MoveList()
+        moves = move_list.moves
+        count = 0
+        bitboards = self.bitboards
+        mailbox = self.mailbox
+        side = self.turn
+        offset = 0 if side == color.white else 6
         
-        return moves
-    
-    def generate_rook_moves(self, pc: int) -> list[int]:
-        moves = []
-        bitboard = self.bitboards[pc]
-        if (self.turn == color.white and pc == piece.R) or (self.turn == color.black and pc == piece.r):
-            while bitboard:
-                source_square = get_ls1b_index(bitboard)
-                attacks = get_rook_attacks(source_square, self.occupancies[color.both]) & ~self.occupancies[self.turn]
-                while attacks:
-                    target_square = get_ls1b_index(attacks)
-                    
-                    # Quiet move
-                    if not get_bit(self.occupancies[color.both], target_square):
-                        moves.append(encode_move(source_square, target_square, pc, 0, 0, 0, 0, 0))  
-                    # Attack
-                    else:
-                        moves.append(encode_move(source_square, target_square, pc, 0, 1, 0, 0, 0)) 
-                    
-                    attacks = pop_bit(attacks, target_square)
-                bitboard = pop_bit(bitboard, source_square)
+        # Pawn moves
+        pawns = bitboards[piece.P + offset]
+        count = self.generate_pawn_moves(moves, count, side, pawns, ALL_SQUARES)
+        
+        # En passant
+        if self.en_passant != square.no_sq:
+            attackers = pawn_attacks[side ^ 1][self.en_passant] & pawns
+            while attackers:
+                source_square = get_ls1b_index(attackers)
+                moves[count] = encode_move(source_square, self.en_passant, piece.P + offset, 0, 1, 0, 1, 0, piece.p - offset)
+                count += 1
+                attackers &= attackers - 1
         
-        return moves
+        # Knight, bishop, rook and queen moves
+        count = self.generate_piece_moves(moves, count, side, ALL_SQUARES, {})
+        
+        # King moves
+        king = piece.K + offset
+        king_square = get_ls1b_index(bitboards[king])
+        attacks = king_attacks[king_square] & ~self.occupancies[side]
+        while attacks:
+            target_square = get_ls1b_index(attacks)
+            victim = mailbox[target_square]
+            if victim == -1:
+                moves[count] = encode_move(king_square, target_square, king, 0, 0, 0, 0, 0)
+                count += 1
+            else:
+                moves[count] = encode_move(king_square, target_square, king, 0, 1, 0, 0, 0, victim)
+                count += 1
+            attacks &= attacks - 1
+        
+        # Castling moves
+        count = self.generate_castling_moves(moves, count, side)
+        
+        move_list.count = count
+        return move_list
     
-    def generate_queen_moves(self, pc: int) -> list[int]:
-        moves = []
-        bitboard = self.bitboards[pc]
-        if (self.turn == color.white and pc == piece.Q) or (self.turn == color.black and pc == piece.q):
-            while bitboard:
-                source_square = get_ls1b_index(bitboard)
-                attacks = get_queen_attacks(source_square, self.occupancies[color.both]) & ~self.occupancies[self.turn]
-                while attacks:
-                    target_square = get_ls1b_index(attacks)
-                    
-                    # Quiet move
-                    if not get_bit(self.occupancies[color.both], target_square):
-                        moves.append(encode_move(source_square, target_square, pc, 0, 0, 0, 0, 0))  
-                    # Attack
-                    else:
-                        moves.append(encode_move(source_square, target_square, pc, 0, 1, 0, 0, 0)) 
-                    
-                    attacks = pop_bit(attacks, target_square)
-                bitboard = pop_bit(bitboard, source_square)
+    def generate_legal_moves(self, gen: int = gen_type.all, move_list: MoveList | None = None) -> MoveList:
+        """
+        Generate all legal moves for the current player, or only its captures or quiet moves (see gen_type).
+        Check and pin masks built from the between and line rays make sure that no move leaves
+        the king in check, so an empty list of all moves means checkmate or stalemate.
+        Moves are written into move_list if given (e.g. a per-ply buffer) or into a new one.
+        """
+        if move_list is None:
+            move_list = MoveList()
+        moves = move_list.moves
+        count = 0
+        bitboards = self.bitboards
+        mailbox = self.mailbox
+        side = self.turn
+        enemy = side ^ 1
+        offset = 0 if side == color.white else 6
+        enemy_offset = 6 - offset
+        own_occupancy = self.occupancies[side]
+        enemy_occupancy = self.occupancies[enemy]
+        occupancy = self.occupancies[color.both]
+        king = piece.K + offset
+        king_square = get_ls1b_index(bitboards[king])
         
-        return moves
+        # Squares the generated moves may land on
+        if gen == gen_type.captures:
+            gen_mask = enemy_occupancy
+        elif gen == gen_type.quiets:
+            gen_mask = ~occupancy & ALL_SQUARES
+        else:
+            gen_mask = ALL_SQUARES
+        
+        # King moves, with the king lifted off the board so it can't step back along a checking ray
+        occupancy_without_king = occupancy ^ (1 << king_square)
+        attacks = king_attacks[king_square] & ~own_occupancy & gen_mask
+        while attacks:
+            target_square = get_ls1b_index(attacks)
+            if not self.get_attackers(target_square, enemy, occupancy_without_king):
+                victim = mailbox[target_square]
+                if victim == -1:
+                    moves[count] = encode_move(king_square, target_square, king, 0, 0, 0, 0, 0)
+                    count += 1
+                else:
+                    moves[count] = encode_move(king_square, target_square, king, 0, 1, 0, 0, 0, victim)
+                    count += 1
+            attacks &= attacks - 1
+        
+        checkers = self.get_attackers(king_square, enemy, occupancy)
+        
+        # Double check, only the king can move
+        if checkers & (checkers - 1):
+            move_list.count = count
+            return move_list
+        
+        # Other pieces must capture the checker or block the check
+        if checkers:
+            check_mask = between_squares[king_square][get_ls1b_index(checkers)] | checkers
+        else:
+            check_mask = ALL_SQUARES
+            if gen != gen_type.captures:
+                count = self.generate_legal_castling_moves(moves, count, side)
+        
+        # Pinned pieces may only move along the line between the king and the pinning slider
+        pin_masks = {}
+        diagonal_sliders = bitboards[piece.B + enemy_offset] | bitboards[piece.Q + enemy_offset]
+        orthogonal_sliders = bitboards[piece.R + enemy_offset] | bitboards[piece.Q + enemy_offset]
+        snipers = (get_bishop_attacks(king_square, enemy_occupancy) & diagonal_sliders) | (get_rook_attacks(king_square, enemy_occupancy) & orthogonal_sliders)
+        while snipers:
+            sniper_square = get_ls1b_index(snipers)
+            blockers = between_squares[king_square][sniper_square] & occupancy
+            if blockers and not blockers & (blockers - 1) and blockers & own_occupancy:
+                pin_masks[get_ls1b_index(blockers)] = line_squares[king_square][sniper_square]
+            snipers &= snipers - 1
+        
+        # Pawn moves, set-wise for the free pawns and one by one for the pinned ones
+        pawn = piece.P + offset
+        pawns = bitboards[pawn]
+        pinned_pawns = 0
+        for pinned_square in pin_masks:
+            pinned_pawns |= (1 << pinned_square) & pawns
+        count = self.generate_pawn_moves(moves, count, side, pawns & ~pinned_pawns, check_mask, gen)
+        while pinned_pawns:
+            source_square = get_ls1b_index(pinned_pawns)
+            count = self.generate_pawn_moves(moves, count, side, 1 << source_square, check_mask & pin_masks[source_square], gen)
+            pinned_pawns &= pinned_pawns - 1
+        
+        # En passant, both pawns leave their squares so the king is checked against the resulting occupancy directly.
+        # This also covers the discovered check along the rank when the two pawns stand between the king and a rook.
+        if self.en_passant != square.no_sq and gen != gen_type.quiets:
+            captured_square = self.en_passant - 8 if side == color.white else self.en_passant + 8
+            attackers = pawn_attacks[enemy][self.en_passant] & pawns
+            while attackers:
+                source_square = get_ls1b_index(attackers)
+                occupancy_after = occupancy ^ (1 << source_square) ^ (1 << captured_square) | (1 << self.en_passant)
+                if not self.get_attackers(king_square, enemy, occupancy_after) & ~(1 << captured_square):
+                    moves[count] = encode_move(source_square, self.en_passant, pawn, 0, 1, 0, 1, 0, piece.P + enemy_offset)
+                    count += 1
+                attackers &= attackers - 1
+        
+        # Knight, bishop, rook and queen moves
+        count = self.generate_piece_moves(moves, count, side, check_mask & gen_mask, pin_masks)
+        
+        move_list.count = count
+        return move_list
     
-    def generate_king_moves(self, pc: int) -> list[int]:
-        moves = []
-        bitboard = self.bitboards[pc]
-        if (self.turn == color.white and pc == piece.K) or (self.turn == color.black and pc == piece.k):
-            while bitboard:
-                source_square = get_ls1b_index(bitboard)
-                attacks = self.king_attacks[source_square] & ~self.occupancies[self.turn]
-                
-                while attacks:
-                    target_square = get_ls1b_index(attacks)
-                    
-                    # Quiet move
-                    if not get_bit(self.occupancies[color.both], target_square):
-                        moves.append(encode_move(source_square, target_square, pc, 0, 0, 0, 0, 0))  
-                                                    
-                    # Attack
-                    else:
-                        moves.append(encode_move(source_square, target_square, pc, 0, 1, 0, 0, 0)) 
-                    
-                    attacks = pop_bit(attacks, target_square)
-                bitboard = pop_bit(bitboard, source_square)
-        return moves
+    def generate_captures(self, move_list: MoveList | None = None) -> MoveList:
+        """Generate the legal captures, en passant captures and promotions of the current player."""
+        return self.generate_legal_moves(gen_type.captures, move_list)
     
-    def generate_moves(self) -> list[int]:
-        """Generate all moves for the current player."""
-        moves = []
-        # Loop over all bitboards
-        for pc in range(12):
-            bitboard = self.bitboards[pc]
-            
-            # Generate white pawns and white king castling moves
-            if self.turn == color.white:
-                # Generate white pawns moves
-                if pc == piece.P:
-                    moves += self.generate_pawn_moves(color.white)
-                elif pc == piece.K:
-                    moves += self.generate_castling_moves(color.white)
-            # Generate black pawns and black king castling moves
+    def generate_quiets(self, move_list: MoveList | None = None) -> MoveList:
+        """Generate the legal non-capturing, non-promoting moves of the current player, castling included."""
+        return self.generate_legal_moves(gen_type.quiets, move_list)
+    
+    def is_move_legal(self, move: int) -> bool:
+        """
+        Check whether a move that was generated in some other position (a transposition table or killer move)
+        is legal in the current one, without generating all moves.
+        """
+        source_square = get_move_source(move)
+        target_square = get_move_target(move)
+        m_piece = get_move_piece(move)
+        promoted = get_move_promoted(move)
+        capture = get_move_capture(move)
+        enpassant = get_move_enpassant(move)
+        side = self.turn
+        offset = 0 if side == color.white else 6
+        mailbox = self.mailbox
+        
+        # The moving piece must belong to the side to move and stand on the source square
+        if not offset <= m_piece < offset + 6 or mailbox[source_square] != m_piece:
+            return False
+        
+        # The target square must hold the encoded victim, or be empty
+        if enpassant:
+            if target_square != self.en_passant or m_piece != piece.P + offset or get_move_captured(move) != piece.p - offset:
+                return False
+        elif capture:
+            if mailbox[target_square] != get_move_captured(move) or not get_bit(self.occupancies[side ^ 1], target_square):
+                return False
+        elif mailbox[target_square] != -1:
+            return False
+        
+        if get_move_castling(move):
+            castling_moves = MoveList(2)
+            if not self.is_king_in_check(side):
+                castling_moves.count = self.generate_legal_castling_moves(castling_moves.moves, 0, side)
+            return move in castling_moves
+        
+        # The piece must be able to reach the target square
+        piece_type = m_piece - offset
+        occupancy = self.occupancies[color.both]
+        if piece_type == piece.P:
+            promotion_rank = 7 if side == color.white else 0
+            if (target_square // 8 == promotion_rank) != (promoted != 0) or (promoted and not offset < promoted < offset + 5):
+                return False
+            direction = 8 if side == color.white else -8
+            if capture:
+                reachable = get_bit(pawn_attacks[side][source_square], target_square)
+            elif get_move_double_push(move):
+                start_rank = 1 if side == color.white else 6
+                reachable = source_square // 8 == start_rank and target_square == source_square + 2 * direction and not get_bit(occupancy, source_square + direction)
             else:
-                if pc == piece.p:
-                    moves += self.generate_pawn_moves(color.black)
-                elif pc == piece.k:
-                    moves += self.generate_castling_moves(color.black)
-            
-            # Generate knight moves
-            moves += self.generate_knight_moves(pc)
-            
-            # Generate bishop moves
-            moves += self.generate_bishop_moves(pc)
-            
-            # Generate rook moves
-            moves += self.generate_rook_moves(pc)
-                    
-            # Generate queen moves
-            moves += self.generate_queen_moves(pc)
-            
-            # Generate king moves
-            moves += self.generate_king_moves(pc)
+                reachable = target_square == source_square + direction
+        elif promoted or get_move_double_push(move):
+            return False
+        elif piece_type == piece.N:
+            reachable = get_bit(knight_attacks[source_square], target_square)
+        elif piece_type == piece.B:
+            reachable = get_bit(get_bishop_attacks(source_square, occupancy), target_square)
+        elif piece_type == piece.R:
+            reachable = get_bit(get_rook_attacks(source_square, occupancy), target_square)
+        elif piece_type == piece.Q:
+            reachable = get_bit(get_queen_attacks(source_square, occupancy), target_square)
+        else:
+            reachable = get_bit(king_attacks[source_square], target_square)
+        if not reachable:
+            return False
+        
+        # Finally make sure the move doesn't leave the king in check
+        if self.make_move(move):
+            self.unmake_move(move)
+            return True
+        return False
+    
+    def generate_legal_castling_moves(self, moves: list[int], count: int, side: int) -> int:
+        """Write the legal castling moves of the given side into the move buffer and return the new count. The king must not be in check, which is up to the caller."""
+        occupancy = self.occupancies[color.both]
+        enemy = side ^ 1
         
-        return moves
+        if side == color.white:
+            if self.castle & castle.wk and not occupancy & ((1 << square.f1) | (1 << square.g1)):
+                # Make sure the king doesn't pass through or land on an attacked square
+                if not self.attacks_by(enemy) & ((1 << square.f1) | (1 << square.g1)):
+                    moves[count] = encode_move(square.e1, square.g1, piece.K, 0, 0, 0, 0, 1)
+                    count += 1
+            if self.castle & castle.wq and not occupancy & ((1 << square.b1) | (1 << square.c1) | (1 << square.d1)):
+                if not self.attacks_by(enemy) & ((1 << square.d1) | (1 << square.c1)):
+                    moves[count] = encode_move(square.e1, square.c1, piece.K, 0, 0, 0, 0, 1)
+                    count += 1
+        else:
+            if self.castle & castle.bk and not occupancy & ((1 << square.f8) | (1 << square.g8)):
+                if not self.attacks_by(enemy) & ((1 << square.f8) | (1 << square.g8)):
+                    moves[count] = encode_move(square.e8, square.g8, piece.k, 0, 0, 0, 0, 1)
+                    count += 1
+            if self.castle & castle.bq and not occupancy & ((1 << square.b8) | (1 << square.c8) | (1 << square.d8)):
+                if not self.attacks_by(enemy) & ((1 << square.d8) | (1 << square.c8)):
+                    moves[count] = encode_move(square.e8, square.c8, piece.k, 0, 0, 0, 0, 1)
+                    count += 1
+        
+        return count
                 
-    def make_move(self, move: int) -> bool:
+    def make_move(self, move: int, is_legal: bool = False) -> bool:
         """
         Executes a move on the chess board, updating the board state accordingly.
         This method handles all aspects of move execution, including piece movement, captures,
         promotions, en passant, castling, updating castling rights, en passant squares, and move clocks.
+        The state needed to take the move back is pushed on the undo stack, see `unmake_move`.
         It also ensures that the move does not leave the player's king in check; if it does, the move is reverted.
+        Moves that come from `generate_legal_moves` can pass is_legal=True to skip that check.
         """
-        # Preserve board state
-        state = self.copy_board()
-        
         # Parse move
         source_square = get_move_source(move)
         target_square = get_move_target(move)
@@ -564,66 +867,74 @@ class Board:
         enpassant = get_move_enpassant(move)
         castling = get_move_castling(move)
         
+        bitboards = self.bitboards
+        occupancies = self.occupancies
+        mailbox = self.mailbox
+        side = self.turn
+        
+        # Preserve the irreversible part of the board state
+        self.undo_stack.append((self.castle, self.en_passant, self.halfmove, self.hash))
+        attacks_cache = self.attacks_cache
+        attacks_cache[0] = attacks_cache[1] = None
+        
         # Move piece
-        self.bitboards[m_piece] = pop_bit(self.bitboards[m_piece], source_square)
-        self.bitboards[m_piece] = set_bit(self.bitboards[m_piece], target_square)
+        from_to = (1 << source_square) | (1 << target_square)
+        bitboards[m_piece] ^= from_to
+        occupancies[side] ^= from_to
+        key = self.hash ^ piece_keys[m_piece][source_square] ^ piece_keys[m_piece][target_square]
         
-        # Handle capture moves
+        # Handle capture and en passant moves, the victim is carried by the move
         if capture:
-            # Loop over bitboards opposite to current turn
-            opposite_range = range(6) if self.turn == color.black else range(6, 12)
-            for pce in opposite_range:
-                if get_bit(self.bitboards[pce], target_square):
-                    self.bitboards[pce] = pop_bit(self.bitboards[pce], target_square)
-                    break
+            captured = get_move_captured(move)
+            if enpassant:
+                captured_square = target_square - 8 if side == color.white else target_square + 8
+                mailbox[captured_square] = -1
+            else:
+                captured_square = target_square
+            bitboards[captured] ^= 1 << captured_square
+            occupancies[side ^ 1] ^= 1 << captured_square
+            key ^= piece_keys[captured][captured_square]
+        
+        mailbox[source_square] = -1
+        mailbox[target_square] = m_piece
         
         # Handle promotion moves
         if promoted:
-            self.bitboards[m_piece] = pop_bit(self.bitboards[m_piece], target_square)
-            self.bitboards[promoted] = set_bit(self.bitboards[promoted], target_square)
-        
-        # Handle en passant captures
-        if enpassant:
-            if self.turn == color.white:
-                self.bitboards[piece.p] = pop_bit(self.bitboards[piece.p], target_square - 8)
-            else:
-                self.bitboards[piece.P] = pop_bit(self.bitboards[piece.P], target_square + 8)
+            bitboards[m_piece] ^= 1 << target_square
+            bitboards[promoted] ^= 1 << target_square
+            mailbox[target_square] = promoted
+            key ^= piece_keys[m_piece][target_square] ^ piece_keys[promoted][target_square]
 
         # Reset en passant square
+        if self.en_passant != square.no_sq:
+            key ^= en_passant_keys[self.en_passant]
         self.en_passant = square.no_sq
         
         # Handle double push
         if double_push:
-            if self.turn == color.white:
+            if side == color.white:
                 self.en_passant = target_square - 8
             else:
                 self.en_passant = target_square + 8
+            key ^= en_passant_keys[self.en_passant]
         
         # Handle castling
         if castling:
-            match target_square:
-                case square.g1:
-                    self.bitboards[piece.R] = pop_bit(self.bitboards[piece.R], square.h1)
-                    self.bitboards[piece.R] = set_bit(self.bitboards[piece.R], square.f1)
-                case square.c1:
-                    self.bitboards[piece.R] = pop_bit(self.bitboards[piece.R], square.a1)
-                    self.bitboards[piece.R] = set_bit(self.bitboards[piece.R], square.d1)
-                case square.g8:
-                    self.bitboards[piece.r] = pop_bit(self.bitboards[piece.r], square.h8)
-                    self.bitboards[piece.r] = set_bit(self.bitboards[piece.r], square.f8)
-                case square.c8:
-                    self.bitboards[piece.r] = pop_bit(self.bitboards[piece.r], square.a8)
-                    self.bitboards[piece.r] = set_bit(self.bitboards[piece.r], square.d8)
+            rook, rook_source, rook_target = castling_rook_moves[target_square]
+            rook_from_to = (1 << rook_source) | (1 << rook_target)
+            bitboards[rook] ^= rook_from_to
+            occupancies[side] ^= rook_from_to
+            mailbox[rook_source] = -1
+            mailbox[rook_target] = rook
+            key ^= piece_keys[rook][rook_source] ^ piece_keys[rook][rook_target]
 
         # Update castling rights
-        self.castle &= castling_rights[source_square]
-        self.castle &= castling_rights[target_square]
+        key ^= castle_keys[self.castle]
+        self.castle &= castling_rights[source_square] & castling_rights[target_square]
+        key ^= castle_keys[self.castle]
         
         # Update occupancies
-        self.occupancies[color.white] = self.bitboards[piece.P] | self.bitboards[piece.N] | self.bitboards[piece.B] | self.bitboards[piece.Q] | self.bitboards[piece.K] | self.bitboards[piece.R]
-        self.occupancies[color.black] = self.bitboards[piece.p] | self.bitboards[piece.n] | self.bitboards[piece.b] | self.bitboards[piece.q] | self.bitboards[piece.k] | self.bitboards[piece.r]
-        self.occupancies[color.both] = self.occupancies[color.white] | self.occupancies[color.black]
-        
+        occupancies[color.both] = occupancies[color.white] | occupancies[color.black]
         
         # Update halfmove clock
         self.halfmove += 1
@@ -631,28 +942,95 @@ class Board:
             self.halfmove = 0
             
         # Update fullmove clock
-        if self.turn == color.black:
+        if side == color.black:
             self.fullmove += 1
         
         # Switch turn
         self.turn ^= 1
+        self.hash = key ^ side_key
+        
+        if is_legal:
+            return 1
         
         # Make sure that king is not in check
-        king_square = get_ls1b_index(self.bitboards[piece.k] if self.turn == color.white else self.bitboards[piece.K])
+        king_square = get_ls1b_index(bitboards[piece.K] if side == color.white else bitboards[piece.k])
         if self.is_square_attacked(king_square, self.turn):
             # Move is illegal, take it back.
-            self.restore_board(*state)
+            self.unmake_move(move)
             return 0
             
         else:
             return 1
+    
+    def unmake_move(self, move: int) -> None:
+        """
+        Takes back the given move, which must be the last move made with `make_move`.
+        Pieces are moved back with XORs, the captured piece is read from the move, and the castling
+        rights, en passant square, halfmove clock and Zobrist key are restored from the undo stack.
+        """
+        castle_rights, en_passant, halfmove, key = self.undo_stack.pop()
+        attacks_cache = self.attacks_cache
+        attacks_cache[0] = attacks_cache[1] = None
+        
+        # Parse move
+        source_square = get_move_source(move)
+        target_square = get_move_target(move)
+        m_piece = get_move_piece(move)
+        promoted = get_move_promoted(move)
+        
+        bitboards = self.bitboards
+        occupancies = self.occupancies
+        mailbox = self.mailbox
+        
+        # Switch turn back
+        self.turn ^= 1
+        side = self.turn
+        
+        # Handle castling
+        if get_move_castling(move):
+            rook, rook_source, rook_target = castling_rook_moves[target_square]
+            rook_from_to = (1 << rook_source) | (1 << rook_target)
+            bitboards[rook] ^= rook_from_to
+            occupancies[side] ^= rook_from_to
+            mailbox[rook_target] = -1
+            mailbox[rook_source] = rook
+        
+        # Handle promotion moves
+        if promoted:
+            bitboards[promoted] ^= 1 << target_square
+            bitboards[m_piece] ^= 1 << target_square
+        
+        # Move piece back
+        from_to = (1 << source_square) | (1 << target_square)
+        bitboards[m_piece] ^= from_to
+        occupancies[side] ^= from_to
+        mailbox[source_square] = m_piece
+        mailbox[target_square] = -1
+        
+        # Put the captured piece back
+        if get_move_capture(move):
+            captured = get_move_captured(move)
+            if get_move_enpassant(move):
+                captured_square = target_square - 8 if side == color.white else target_square + 8
+            else:
+                captured_square = target_square
+            bitboards[captured] ^= 1 << captured_square
+            occupancies[side ^ 1] ^= 1 << captured_square
+            mailbox[captured_square] = captured
+        
+        occupancies[color.both] = occupancies[color.white] | occupancies[color.black]
+        
+        # Restore state
+        self.castle = castle_rights
+        self.en_passant = en_passant
+        self.halfmove = halfmove
+        self.hash = key
+        if side == color.black:
+            self.fullmove -= 1
             
     def is_king_in_check(self, king_color) -> bool:
         """Check if the king of the given color is in check."""
-        # get the king square
-        king_square = get_ls1b_index(self.bitboards[piece.K if king_color == color.white else piece.k])
-        
-        other_color = color.black if king_color == color.white else color.white
-        return self.is_square_attacked(king_square, other_color)
+        king = self.bitboards[piece.K if king_color == color.white else piece.k]
+        return self.attacks_by(king_color ^ 1) & king != 0
         
 
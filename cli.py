@@ -7,10 +7,14 @@ os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1" # Suppress pygame welcome message
 import absl.logging
 absl.logging.set_verbosity(absl.logging.ERROR) # disable tensorflow messages
 from LMDB import LMDBWrapper
+from bench import bench, smp_bench
 from board import Board
 from controller import Controller
 from headers import *
+from heuristics_player import HeuristicsPlayer
+from move import str_move
 from perft import perft_test
+from time_control import TimeControl
 from player_select import PlayerSelect
 from tournament import Tournament
 import shlex
@@ -52,6 +56,12 @@ class CLI:
                     self.validate(args)
                 case "perft":
                     self.perft(args)
+                case "bench":
+                    self.bench(args)
+                case "search":
+                    self.search(args)
+                case "smpbench":
+                    self.smp_bench(args)
                 case _:
                     print(f"'{args[0]}' is not a recognized command.")
         except:
@@ -63,9 +73,13 @@ class CLI:
         commands = [
             ("help", "Display this help message."),
             ("play", "Play a game against a player. Usage: play"),
-            ("simulate", "Simulate a tournament between two players. Usage: simulate <num_games> <player_1_type> <player_2_type>"),
+            ("simulate", "Simulate a tournament between two players, with search limits, game clocks and parallel search (run it without arguments for the options). "
+                         "Usage: simulate <num_games> <player_1_type> <player_2_type> [--depth <n>] [--nodes <n>] [--movetime <ms>] [--time <ms>] [--inc <ms>] [--workers <n>] [--hash <mb>]"),
             ("validate", "Validate the scoreboards. Usage: validate"),
-            ("preft", "Run a perft test. Usage: perft <fen> <depth>"),
+            ("perft", "Run a perft test, --hash caches subtree counts in a table of that many entries, --jobs splits it between processes (0 for all cores) and --no-bulk plays every leaf move. Usage: perft <fen> <depth> [--hash <entries>] [--jobs <n>] [--no-bulk]"),
+            ("search", "Search a position with the heuristics player and report the best move, score, nodes, time and first move cutoff rate, --workers searches in that many processes. Usage: search <fen> [--depth <n>] [--nodes <n>] [--movetime <ms>] [--workers <n>]"),
+            ("smpbench", "Measure the time to depth of the parallel search with 1, 2, 4 and 8 workers. Usage: smpbench [--depth <n>]"),
+            ("bench", "Run the perft benchmark suite, write the results as JSON and compare them with a baseline results file. Usage: bench [--baseline <path>] [--output <path>]"),
             ("exit", "Exit the program."),
         ]
         for command in commands:
@@ -84,16 +98,39 @@ class CLI:
         Controller(player_select).start()
 
     
-    def simulate(self, args) -> None: # simulate <num_games> <player_1_type> <player_2_type>
+    def simulate(self, args) -> None: # simulate <num_games> <player_1_type> <player_2_type> [--depth <n>] [--nodes <n>] [--movetime <ms>] [--time <ms>] [--inc <ms>] [--workers <n>] [--hash <mb>]
         """Simulate a tournament between two players."""
+        usage = ("Usage: simulate <num_games> <player_1_type> <player_2_type> [--depth <n>] [--nodes <n>] [--movetime <ms>] [--time <ms>] [--inc <ms>] [--workers <n>] [--hash <mb>]\n"
+                 "  --depth, --nodes   limit the search of the searching players per move\n"
+                 "  --movetime         gives them a fixed time per move, in milliseconds\n"
+                 "  --time, --inc      give them a game clock and an increment per move, in milliseconds\n"
+                 "                     (with a time limit and no --depth the depth is unlimited)\n"
+                 "  --workers          runs the heuristics search in that many processes\n"
+                 "  --hash             sets the transposition table size in MB")
+        options = {"--depth": SEARCH_DEPTH, "--nodes": 0, "--movetime": 0, "--time": 0, "--inc": 0, "--workers": 1, "--hash": TT_SIZE_MB}
+        if "--depth" not in args and ("--movetime" in args or "--time" in args):
+            options["--depth"] = 0 # Only the time limits the search
+        while len(args) > 4:
+            if len(args) < 6 or args[-2] not in options or not args[-1].isnumeric():
+                print("Invalid option.")
+                print(usage)
+                return
+            options[args[-2]] = int(args[-1])
+            args = args[:-2]
+        
         if len(args) != 4:
             print("Invalid number of arguments.")
-            print("Usage: simulate <num_games> <player_1_type> <player_2_type>")
+            print(usage)
             return
         
         if not args[1].isnumeric():
             print("Invalid number of games.")
-            print("Usage: simulate <num_games> <player_1_type> <player_2_type>")
+            print(usage)
+            return
+        
+        if options["--depth"] < 1 and not (options["--movetime"] or options["--time"]):
+            print("Invalid depth.")
+            print(usage)
             return
         
         num_games = int(args[1])
@@ -113,21 +150,34 @@ class CLI:
         
         player_2_type = player_type_converter[player_2_type]
         
-        tournament = Tournament(player_1_type, player_2_type, num_games)
+        tournament = Tournament(player_1_type, player_2_type, num_games, options["--depth"], options["--nodes"], options["--hash"],
+                                options["--movetime"], options["--time"], options["--inc"], max(options["--workers"], 1))
         tournament.start()
         tournament.print_results()
         
-    def perft(self, args) -> None: # perft <fen> <depth>
+    def perft(self, args) -> None: # perft <fen> <depth> [--hash <entries>] [--jobs <n>] [--no-bulk]
         """Run a perft test."""
+        usage = "Usage: perft <fen> <depth> [--hash <entries>] [--jobs <n>] [--no-bulk]"
+        bulk = "--no-bulk" not in args
+        args = [arg for arg in args if arg != "--no-bulk"]
+        options = {"--hash": 0, "--jobs": 1}
+        while len(args) > 3:
+            if len(args) < 5 or args[-2] not in options or not args[-1].isnumeric():
+                print("Invalid option.")
+                print(usage)
+                return
+            options[args[-2]] = int(args[-1])
+            args = args[:-2]
+        
         if len(args) != 3:
             print("Invalid number of arguments.")
-            print("Usage: perft <fen> <depth>")
+            print(usage)
             return
         
         starting_fen = args[1]
         if not args[2].isnumeric():
             print("Invalid depth.")
-            print("Usage: perft <fen> <depth>")
+            print(usage)
             return
         
         depth = int(args[2])
@@ -136,12 +186,95 @@ class CLI:
             print(f"Invalid FEN: {starting_fen}")
             return
         
-        print(perft_test(starting_fen, depth))
+        jobs = options["--jobs"] or multiprocessing.cpu_count()
+        print(perft_test(starting_fen, depth, options["--hash"], jobs, bulk))
+    
+    def bench(self, args) -> None: # bench [--baseline <path>] [--output <path>]
+        """Run the perft benchmark suite."""
+        usage = "Usage: bench [--baseline <path>] [--output <path>]"
+        options = {"--baseline": None, "--output": BENCH_OUTPUT_PATH}
+        args = args[1:]
+        while args:
+            if len(args) < 2 or args[0] not in options:
+                print("Invalid option.")
+                print(usage)
+                return
+            options[args[0]] = args[1]
+            args = args[2:]
+        
+        baseline_path = options["--baseline"]
+        if baseline_path and not os.path.isfile(baseline_path):
+            print(f"Invalid file: {baseline_path}")
+            return
+        
+        if bench(options["--output"], baseline_path):
+            print("Benchmark passed.")
+        else:
+            print("Benchmark failed.")
+    
+    def search(self, args) -> None: # search <fen> [--depth <n>] [--nodes <n>] [--movetime <ms>] [--workers <n>]
+        """Search a position with the heuristics player."""
+        usage = "Usage: search <fen> [--depth <n>] [--nodes <n>] [--movetime <ms>] [--workers <n>]"
+        options = {"--depth": SEARCH_DEPTH, "--nodes": 0, "--movetime": 0, "--workers": 1}
+        if "--depth" not in args and "--movetime" in args:
+            options["--depth"] = 0 # Only the time limits the search
+        while len(args) > 2:
+            if len(args) < 4 or args[-2] not in options or not args[-1].isnumeric():
+                print("Invalid option.")
+                print(usage)
+                return
+            options[args[-2]] = int(args[-1])
+            args = args[:-2]
+        
+        if len(args) != 2:
+            print("Invalid number of arguments.")
+            print(usage)
+            return
+        
+        if not Board.validate_fen(args[1]):
+            print(f"Invalid FEN: {args[1]}")
+            return
+        
+        if options["--depth"] < 1 and not options["--movetime"]:
+            print("Invalid depth.")
+            print(usage)
+            return
+        
+        board = Board(args[1])
+        time_control = TimeControl(options["--movetime"])
+        search = HeuristicsPlayer(board, board.turn, options["--depth"], options["--nodes"], time_control=time_control, workers=options["--workers"]).search
+        move = search.search()
+        if options["--workers"] > 1:
+            search.close()
+        if not move:
+            print("No legal moves.")
+            return
+        print(f"Best move: {str_move(move)}")
+        print(search.report())
+    
+    def smp_bench(self, args) -> None: # smpbench [--depth <n>]
+        """Run the parallel search benchmark."""
+        usage = "Usage: smpbench [--depth <n>]"
+        options = {"--depth": SMP_BENCH_DEPTH}
+        while len(args) > 1:
+            if len(args) < 3 or args[-2] not in options or not args[-1].isnumeric():
+                print("Invalid option.")
+                print(usage)
+                return
+            options[args[-2]] = int(args[-1])
+            args = args[:-2]
+        
+        if options["--depth"] < 1:
+            print("Invalid depth.")
+            print(usage)
+            return
+        
+        smp_bench(options["--depth"])
     
     def read_chunk(self, start_idx: int, end_idx: int, db_path: str) -> Tuple[int, int, int]:
         """Worker function to read a chunk of the DB and count categories."""  # Import inside the process
         from LMDB import LMDBWrapper
-        db = LMDBWrapper(db_path)
+        db = LMDBWrapper(db_path, migrate=False) # Migrated by the main process
         cursor = db.env.begin().cursor()
         
         ones = zeros = betweens = 0
@@ -1,4 +1,5 @@
 import pygame
+from time import perf_counter
 from ai_player import AIPlayer
 from attacks import START_POSITION
 from board import Board
@@ -7,20 +8,28 @@ from heuristics_player import HeuristicsPlayer
 from move import get_move_capture
 from random_player import RandomPlayer
 from smart_player import SmartPlayer
+from time_control import TimeControl
+from transposition import SharedTranspositionTable, TranspositionTable
 
 
 class Game:
     """
     A class to represent a chess game, supporting both automated play and graphical interaction.
     """
-    def __init__(self, player_1_type: int, player_2_type: int, db, model) -> None:
+    def __init__(self, player_1_type: int, player_2_type: int, db, model, depth: int = SEARCH_DEPTH, nodes: int = 0, hash_mb: int = TT_SIZE_MB,
+                 movetime: int = 0, time: int = 0, increment: int = 0, workers: int = 1) -> None:
         self.board: Board = Board(starting_fen=START_POSITION)
-        self.board_copy = self.board.copy_board()
-        self.game_data = {"start_fen": START_POSITION, "positions": [START_POSITION]}
+        self.game_data = {"start_fen": START_POSITION, "positions": [self.board.encode_position()]}
         self.db = db
         self.model = model
         self.play_sound = None
         self.results = None
+        self.depth = depth # Search limits of the searching players
+        self.nodes = nodes
+        self.workers = workers # Processes of each heuristics player's search
+        # Shared by the searching players and kept for the whole game, and the next ones
+        self.tt = SharedTranspositionTable(hash_mb) if workers > 1 else TranspositionTable(hash_mb)
+        self.clocks = [TimeControl(movetime, time, increment) for _ in range(2)] # Time control of each color, in milliseconds
         
         # Set the player types
         self.player_1 = None
@@ -37,7 +46,7 @@ class Game:
             case player_type.random:
                 self.player_1 = RandomPlayer(self.board, color.white)
             case player_type.heuristics:
-                self.player_1 = HeuristicsPlayer(self.board, color.white)
+                self.player_1 = HeuristicsPlayer(self.board, color.white, self.depth, self.nodes, self.tt, self.clocks[color.white], self.workers)
             case player_type.smart:
                 print("PLAYER 1 CAN'T BE SMART")
             
@@ -50,11 +59,11 @@ class Game:
             case player_type.random:
                 self.player_2 = RandomPlayer(self.board, color.black)
             case player_type.heuristics:
-                self.player_2 = HeuristicsPlayer(self.board, color.black)
+                self.player_2 = HeuristicsPlayer(self.board, color.black, self.depth, self.nodes, self.tt, self.clocks[color.black], self.workers)
             case player_type.smart:
                 self.player_2 = SmartPlayer(self.board, self.db, color.black)
             case player_type.ai:
-                self.player_2 = AIPlayer(self.board, self.model, color.black)
+                self.player_2 = AIPlayer(self.board, self.model, color.black, nodes=self.nodes, time_control=self.clocks[color.black])
             case player_type.graphics:
                 print("PLAYER 2 CAN'T BE GRAPHICS")
             case _:
@@ -64,29 +73,38 @@ class Game:
         """
         Resets the game state to its initial configuration.
 
-        This method restores the board to its original state using a saved copy,
-        resets the game data to the starting position, and clears any game results.
+        This method parses the starting position back into the board (which also clears
+        its undo stack), resets the game data to the starting position, and clears any game results.
         """
-        self.board.restore_board(*self.board_copy)
-        self.game_data = {"start_fen": START_POSITION, "positions": [START_POSITION]}
+        self.board.parse_fen(START_POSITION)
+        self.game_data = {"start_fen": START_POSITION, "positions": [self.board.encode_position()]}
         self.results = None
+        for clock in self.clocks:
+            clock.reset()
+    
+    def make_player_move(self, player) -> int | None:
+        """Let the player make its move and run its clock down by the time it took."""
+        start = perf_counter()
+        move = player.make_player_move()
+        self.clocks[player.color].update(perf_counter() - start)
+        return move
     
     # For auto play
-    def play(self) -> dict[str, list[str] | str]:
+    def play(self) -> dict[str, list[bytes] | str]:
         """
         Executes the main game loop for the chess engine.
         The game continues until a checkmate, stalemate, or the maximum move count
         (50 halfmoves) is reached. Players alternate making moves, and the game
-        state is updated accordingly.
+        state is updated accordingly. A player that runs out of time on a game clock loses.
         """
         # Keep on playing until a checkmate or max move count reached
         while self.results == None and self.board.halfmove <= 50:
             
             # Players making their moves
             if self.board.turn == color.white:
-                move = self.player_1.make_player_move()
+                move = self.make_player_move(self.player_1)
             else:
-                move = self.player_2.make_player_move()
+                move = self.make_player_move(self.player_2)
 
             # Check if this player is in checkmate or its a stalemate
             if move == None:
@@ -96,7 +114,12 @@ class Game:
                     self.results = game_results.stalemate
                 break
             
-            self.game_data["positions"].append(self.board.to_scoreboard_array())
+            self.game_data["positions"].append(self.board.encode_position())
+            
+            # Lost on time, the player who just moved is the other color now
+            if self.clocks[self.board.turn ^ 1].is_flagged():
+                self.results = game_results.black if self.board.turn == color.black else game_results.white
+                break
         
         if self.board.halfmove > 50:
             self.results = game_results.stalemate
@@ -111,22 +134,20 @@ class Game:
         Returns a tuple indicating (whether the move was successful, the other player's move,
         and the game result if applicable.)
         """
-        if move not in self.board.generate_moves(): # If move is not possible
+        if move not in self.board.generate_legal_moves(): # If move is not possible
             return False, False, None
         
         # Make the graphics move
-        graphics_move_result = self.board.make_move(move)
-        if not graphics_move_result: # If move is not possible
-            return False, False, None
+        self.board.make_move(move, is_legal=True)
         
-        self.game_data["positions"].append(self.board.to_scoreboard_array())
+        self.game_data["positions"].append(self.board.encode_position())
         if self.board.halfmove > 50:
             self.results = game_results.stalemate
             self.play_sound("game-end")
             return True, None, self.results
         
         # Make the other player's move
-        move_result = self.player_2.make_player_move()
+        move_result = self.make_player_move(self.player_2)
         
         # Check if this player is in checkmate or its a stalemate
         if move_result == None:
@@ -142,7 +163,7 @@ class Game:
                 self.play_sound("capture")
             else:
                 self.play_sound("move")
-            self.game_data["positions"].append(self.board.to_scoreboard_array())
+            self.game_data["positions"].append(self.board.encode_position())
 
         # Check if the graphics player have a valid move to play
         if self.board.halfmove > 50:
@@ -151,10 +172,7 @@ class Game:
             return True, move_result, self.results
 
         # Check if the graphics player have a valid move to play
-        board_copy = self.board.copy_board()
-        graphics_move_result = self.player_1.make_player_move()
-        
-        if graphics_move_result == None: # If move is not possible
+        if len(self.board.generate_legal_moves()) == 0: # If move is not possible
             if self.board.is_king_in_check(self.board.turn):
                 self.results = game_results.black if self.board.turn == color.white else game_results.white
                 self.play_sound("checkmate")
@@ -167,6 +185,5 @@ class Game:
                 self.play_sound("capture")
             else:
                 self.play_sound("move")
-            self.board.restore_board(*board_copy)
         
         return True, move_result, None
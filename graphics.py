@@ -127,11 +127,19 @@ class Graphics:
         """
         Draws the chessboard squares on the screen.
         This method iterates through an 8x8 grid representing the chessboard.
-        It alternates between light and dark tiles based on the row and column indices.
+        It alternates between light and dark tiles based on the row and column indices,
+        and highlights the king of the player to move when it is in check.
         """
+        # The attack map is cached on the board, so this is only computed once per position
+        checked_king = -1
+        if self.board.is_king_in_check(self.board.turn):
+            checked_king = get_ls1b_index(self.board.bitboards[piece.k if self.board.turn else piece.K])
+        
         for row in range(8):
             for col in range(8):
-                if (row + col) % 2 == 0:
+                if (7 - row) * 8 + col == checked_king:
+                    color = CHECK_TILE
+                elif (row + col) % 2 == 0:
                     if (7 - row) * 8 + col in self.last_squares:
                         color = LIGHT_TILE_SELECTED
                     else:
@@ -160,25 +168,23 @@ class Graphics:
     def draw_pieces(self) -> None:
         """
         Draws the chess pieces on the board.
-        This method iterates through the bitboards representing the positions of 
-        each type of chess piece and draws the corresponding sprite on the screen 
-        at the appropriate location. It uses cached sprites for efficiency.
+        This method iterates through the board's piece-on-square array and draws
+        the corresponding sprite on the screen at the appropriate location.
+        It uses cached sprites for efficiency.
         The method also checks if a piece is currently being held (dragged) by the 
         user and skips drawing it on the board, storing its type for later use.
         """
-        for i, bitboard in enumerate(self.board.bitboards):
-            sprite = self.sprites_cache[i]  # Use the cached sprite
-            while bitboard:
-                index = get_ls1b_index(bitboard)  # Calculate the index of the bit
-                bitboard &= bitboard - 1  # Remove the least significant bit
-                
-                if self.holden_square is not None and index == self.holden_square:
-                    self.holden_piece = i
-                    continue
-                
-                col = index % 8
-                row = 7 - (index // 8)
-                self.screen.blit(sprite, (col * (WINDOW_SIZE // 8), row * (WINDOW_SIZE // 8)))  # Draw the sprite
+        for index, i in enumerate(self.board.mailbox):
+            if i == -1:
+                continue
+            
+            if self.holden_square is not None and index == self.holden_square:
+                self.holden_piece = i
+                continue
+            
+            col = index % 8
+            row = 7 - (index // 8)
+            self.screen.blit(self.sprites_cache[i], (col * (WINDOW_SIZE // 8), row * (WINDOW_SIZE // 8)))  # Draw the sprite using the cached sprite
 
     def draw_promotion_mode(self) -> None:
         """
@@ -281,8 +287,7 @@ class Graphics:
         """
         Returns a list of possible moves for the piece at the given square.
         """
-        moves = []
-        moves += self.board.generate_moves()
+        moves = self.board.generate_legal_moves()
         moves = [move for move in moves if get_move_source(move) == square]
         return moves
     
@@ -402,7 +407,8 @@ class Graphics:
         castling = (self.holden_piece == piece.K and (self.from_square - self.to_square) in (2, -2))
         
         # Encode the move
-        move = encode_move(self.from_square, self.to_square, piece.P, promotion, capture, double_push, enpassant, castling)
+        captured = self.board.piece_at(self.to_square) if capture else 0
+        move = encode_move(self.from_square, self.to_square, piece.P, promotion, capture, double_push, enpassant, castling, captured)
         status, bots_move, game_state = self.controller.make_move(move)
         if bots_move:
             self.last_squares = [get_move_source(bots_move), get_move_target(bots_move)]
@@ -453,7 +459,13 @@ class Graphics:
                 castling = (self.holden_piece == piece.K and (self.from_square - self.to_square) in (2, -2))
                 
                 # Encode the move
-                move = encode_move(self.from_square, self.to_square, self.holden_piece, promotion, capture, double_push, enpassant, castling)
+                if enpassant:
+                    captured = piece.p
+                elif capture:
+                    captured = self.board.piece_at(self.to_square)
+                else:
+                    captured = 0
+                move = encode_move(self.from_square, self.to_square, self.holden_piece, promotion, capture, double_push, enpassant, castling, captured)
                 status, bots_move, game_state = self.controller.make_move(move)
                 if bots_move:
                     self.last_squares = [get_move_source(bots_move), get_move_target(bots_move)]
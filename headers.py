@@ -47,6 +47,19 @@ class slide_piece(IntEnum):
     bishop = 0
     rook = 1
 
+class gen_type(IntEnum):
+    """Which moves a generator produces. Captures include en passant and all promotions, quiets are everything else."""
+    all = 0
+    captures = 1
+    quiets = 2
+
+class bound(IntEnum):
+    """What a transposition table score is: the exact score, or a lower or upper bound of it (after a beta cutoff or failing low)."""
+    none = 0
+    exact = 1
+    lower = 2
+    upper = 3
+
 
 class player_type(IntEnum):
     random = 0
@@ -69,13 +82,53 @@ NOT_A_FILE: Final = 18374403900871474942
 NOT_H_FILE: Final = 9187201950435737471
 NOT_HG_FILE: Final = 4557430888798830399
 NOT_AB_FILE: Final = 18229723555195321596
+RANK_1: Final = 255
+RANK_3: Final = 16711680
+RANK_6: Final = 280375465082880
+RANK_8: Final = 18374686479671623680
+ALL_SQUARES: Final = 18446744073709551615
+
+# Search limits
+MAX_MOVES: Final = 256 # More than the legal moves of any reachable position (218)
+MAX_PLY: Final = 128
+MAX_HALFMOVE: Final = 1023 # Largest halfmove clock, it is packed into 10 bits by Board.copy_board
+SEARCH_DEPTH: Final = 3 # Default iterative deepening depth of the search
+MATE_SCORE: Final = 100000 # Score of being mated now, a mate in n plies scores MATE_SCORE - n
+INFINITE_SCORE: Final = 1000000
+TT_SIZE_MB: Final = 16 # Default transposition table size
+AI_SEARCH_DEPTH: Final = 1 # Default search depth of the network evaluated player, the quiescence search goes on from there
+NN_SCORE_SCALE: Final = 1000 # Network evaluations are scaled to integer search scores
+TIME_CHECK_NODES: Final = 64 # The search checks the clock every that many nodes, a power of two
+MOVES_TO_GO: Final = 30 # Moves the time left is spread over when the time control doesn't say
+MOVE_OVERHEAD: Final = 20 # Milliseconds kept back per move for everything around the search
+SMP_BENCH_DEPTH: Final = 4 # Depth of the parallel search benchmark
+SMP_BENCH_WORKERS: Final = (1, 2, 4, 8) # Worker counts the parallel search benchmark compares
+PERFT_TABLE_SIZE: Final = 1 << 20 # Entries of the perft transposition table
+
+# Packed position encoding, see `Board.encode_position`
+POSITION_SIZE: Final = 34 # 32 bytes of squares, 1 byte of flags, 1 byte of en passant square
+
+# The shipped model.h5 was trained on inputs that mark h8 in the en passant plane when there is no en passant square
+# (the old scoreboard tensors did divmod(-1, 8)). Training and inference both follow this flag, set it to False only
+# together with retraining the model (python model.py), so the saved model and its inputs always match.
+LEGACY_EN_PASSANT_PLANE: Final = True
 
 # FEN debug positions
-EMPTY_BOARD: Final = "8/8/8/8/8/8/8/8 w - - "
+EMPTY_BOARD: Final = "4k3/8/8/8/8/8/8/4K3 w - - " # Kings only, a board needs one of each
 START_POSITION: Final = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1 "
 TRICKY_POSITION: Final = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1 "
 KILLER_POSITION: Final = "rnbqkb1r/pp1p1pPp/8/2p1pP2/1P1P4/3P3P/P1P1P3/RNBQKBNR w KQkq e6 0 1"
 CMK_POSITION: Final = "r2q1rk1/ppp2ppp/2n1bn2/2b1p3/3pP3/3P1NPP/PPP1NPB1/R1BQ1RK1 b - - 0 9 "
+PERFT_POSITION_3: Final = "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"
+PERFT_POSITION_4: Final = "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1"
+PERFT_POSITION_5: Final = "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8"
+PERFT_POSITION_6: Final = "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"
+
+# Benchmark
+BENCH_OUTPUT_PATH: Final = "bench.json"
+BENCH_REGRESSION_THRESHOLD: Final = 0.1 # Largest allowed drop in total nodes per second against the baseline
+BENCH_REPEATS: Final = 3 # Fewest timed runs per benchmark position, the fastest one counts
+BENCH_MIN_TIME: Final = 0.5 # Seconds each benchmark position is run for at least
 class castle(IntEnum):
     """
     bin   dec  
@@ -95,6 +148,14 @@ class castle(IntEnum):
     bq = 8
     all = 15
 
+# Castling right of each FEN castling character, in FEN order
+char_castling_rights: Final = {
+    'K': castle.wk,
+    'Q': castle.wq,
+    'k': castle.bk,
+    'q': castle.bq
+}
+
 
 #                                castling   move    in      in
 #                                   right   update  binary  decimal
@@ -121,6 +182,14 @@ castling_rights: Final = [
     7, 15, 15, 15,  3, 15, 15, 11
 ]
 
+# Rook, source and target squares for each castling move, keyed by the king's target square
+castling_rook_moves: Final = {
+    square.g1: (piece.R, square.h1, square.f1),
+    square.c1: (piece.R, square.a1, square.d1),
+    square.g8: (piece.r, square.h8, square.f8),
+    square.c8: (piece.r, square.a8, square.d8),
+}
+
 # Bishop relevant occupancy bit count for every square on board
 bishop_relevant_bits: Final = [
     6, 5, 5, 5, 5, 5, 5, 6, 
@@ -200,4 +269,5 @@ LIGHT_TILE: Final = (240, 217, 181)
 LIGHT_TILE_SELECTED: Final = (207, 209, 128)
 DARK_TILE: Final = (181, 136, 99)
 DARK_TILE_SELECTED: Final = (170, 162, 80)
+CHECK_TILE: Final = (235, 97, 80)
 WINDOW_SIZE: Final = 1000
@@ -4,6 +4,10 @@ from bit import get_ls1b_index
 from board import Board
 from player import Player
 from headers import *
+from parallel_search import ParallelSearch
+from search import Search
+from time_control import TimeControl
+from transposition import SharedTranspositionTable, TranspositionTable
 import random
 
 class piece_score(IntEnum):
@@ -14,39 +18,50 @@ class piece_score(IntEnum):
     knight = 3
     pawn = 1
 
+# Piece scores indexed by piece type, pawn to king, for delta pruning in the quiescence search
+piece_type_scores: Final = (piece_score.pawn, piece_score.knight, piece_score.bishop, piece_score.rook, piece_score.queen, piece_score.king)
+
+def helper_search(board: Board, tt: SharedTranspositionTable) -> Search:
+    """Build the search of a helper process of a parallel heuristics search."""
+    return HeuristicsPlayer(board, board.turn, tt=tt).search
+
 class HeuristicsPlayer(Player):
-    def __init__(self, board: Board, color: int = color.white) -> None:
+    def __init__(self, board: Board, color: int = color.white, depth: int = SEARCH_DEPTH, nodes: int = 0, tt: TranspositionTable | SharedTranspositionTable | None = None,
+                 time_control: TimeControl | None = None, workers: int = 1) -> None:
+        """
+        depth is the deepest iteration of the search and nodes the most nodes it may visit per move (0 for no limit).
+        tt is the transposition table of the search, pass the game's table to keep it warm between moves.
+        time_control limits the time of each move, see `TimeControl`.
+        With more than one worker the search runs in parallel in that many processes, see `ParallelSearch`,
+        and tt must then be a `SharedTranspositionTable` (a new one is made if it isn't given).
+        """
         super().__init__(board, color)
+        if workers > 1:
+            self.search = ParallelSearch(board, self.evaluate_position, helper_search, workers, depth, nodes, tt, piece_type_scores, time_control)
+        else:
+            self.search = Search(board, self.evaluate_position, depth, nodes, tt, piece_type_scores, time_control)
 
     def make_player_move(self) -> int | None:
         """
         Executes the best possible move for the player based on heuristic evaluations.
-        This method generates all possible moves for the current board state, evaluates
-        each move using a heuristic function, and selects the move with the highest evaluation.
-        Illegal moves are filtered out during the evaluation process.
+        The move is chosen by an alpha-beta search over `evaluate_position`, deepened one ply
+        at a time up to the depth, node and time limits of the player, with a quiescence search over
+        the captures and promotions at the leaves.
         """
-        all_moves = self.board.generate_moves()
-        
-        move_evaluations = [(move, self.evaluate_move(move)) for move in all_moves] # Attaching an evaluation to each of the moves
-        move_evaluations = [x for x in move_evaluations if x[1] is not None] # Removing illegal moves
-        move_evaluations.sort(key=lambda x: x[1], reverse=True) # Sorting by evaluations
-
-        if len(move_evaluations) == 0:
+        move = self.search.search()
+        if not move:
             return None
-        else:
-            self.board.make_move(move_evaluations[0][0])
-            return move_evaluations[0][0]
+        
+        self.board.make_move(move, is_legal=True)
+        return move
             
-    def evaluate_move(self, move) -> int | None:
+    def evaluate_move(self, move) -> int:
         """
-        Evaluates the given move by simulating it on the board and calculating the resulting position's evaluation.
+        Evaluates the given legal move by simulating it on the board and calculating the resulting position's evaluation.
         """
-        before = self.board.copy_board()
-        status = self.board.make_move(move)
-        evaluation = None
-        if status:
-            evaluation = self.evaluate_position()
-        self.board.restore_board(*before)
+        self.board.make_move(move, is_legal=True)
+        evaluation = -self.evaluate_position() # The opponent is to move after the move
+        self.board.unmake_move(move)
         return evaluation
             
     def evaluate_position(self) -> int:
@@ -64,5 +79,5 @@ class HeuristicsPlayer(Player):
                          piece_score.bishop * (piece_count[piece.B] - piece_count[piece.b]) + \
                          piece_score.pawn * (piece_count[piece.P] - piece_count[piece.p])
         
-        who_to_move = 1 if self.color == color.white else -1
+        who_to_move = 1 if self.board.turn == color.white else -1
         return (material_score) * who_to_move
\ No newline at end of file
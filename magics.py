@@ -1,7 +1,13 @@
 from headers import *
 from bit import *
 from attacks import *
+from array import array
+from typing import Final
+import hashlib
+import mmap
+import os
 import random
+import sys
 
 def generate_magic_number_candidate() -> int:
     """Generate a random number to be used as a candidate for a magic number."""
@@ -68,12 +74,28 @@ def init_magic_numbers() -> None:
     for square in range(64):
         print(find_magic_number(square, rook_relevant_bits[square], slide_piece.rook))
 
-def init_sliding_attacks() -> tuple[list[int], list[int], dict[int, dict[int, int]], dict[int, dict[int, int]]]:
-    """Initialize the attacks, masks and magic numbers for the given sliding piece type."""
+def init_attack_offsets(relevant_bits: list[int]) -> list[int]:
+    """Return the offset of every square's slice in a flat attack table, each square taking 2^relevant_bits entries."""
+    offsets = [0 for _ in range(64)]
+    for square in range(1, 64):
+        offsets[square] = offsets[square - 1] + (1 << relevant_bits[square - 1])
+    return offsets
+
+bishop_offsets: Final = init_attack_offsets(bishop_relevant_bits)
+rook_offsets: Final = init_attack_offsets(rook_relevant_bits)
+bishop_table_size: Final = bishop_offsets[63] + (1 << bishop_relevant_bits[63])
+rook_table_size: Final = rook_offsets[63] + (1 << rook_relevant_bits[63])
+
+def init_sliding_attacks() -> tuple[list[int], list[int], array, array]:
+    """
+    Initialize the masks and attack tables for bishops and rooks.
+    Each attack table is one flat array of 64-bit entries where every square owns the slice
+    starting at its offset ("fancy" magic layout), so a lookup is a single indexed fetch.
+    """
     bishop_masks = [0 for _ in range(64)]  # Initialize bishop masks
     rook_masks = [0 for _ in range(64)]  # Initialize rook masks
-    bishop_attacks = [{} for _ in range(64)]  # Initialize bishop attacks
-    rook_attacks = [{} for _ in range(64)]  # Initialize rook attacks
+    bishop_attacks = array('Q', bytes(8 * bishop_table_size))  # Initialize bishop attacks
+    rook_attacks = array('Q', bytes(8 * rook_table_size))  # Initialize rook attacks
     
     for square in range(64):
         bishop_masks[square] = mask_bishop_attacks(square)  # Set bishop attack mask
@@ -86,7 +108,7 @@ def init_sliding_attacks() -> tuple[list[int], list[int], dict[int, dict[int, in
         for index in range(occupancy_indicies):
             occupancy = set_occupancy(index, relevant_bits, attack_mask)  # Set occupancy
             magic_index = ((occupancy * bishop_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> (64 - bishop_relevant_bits[square])  # Calculate magic index
-            bishop_attacks[square][magic_index] = generate_bishop_attacks_on_the_fly(square, occupancy)  # Generate bishop attacks
+            bishop_attacks[bishop_offsets[square] + magic_index] = generate_bishop_attacks_on_the_fly(square, occupancy)  # Generate bishop attacks
     
     for square in range(64):
         rook_masks[square] = mask_rook_attacks(square)  # Set rook attack mask
@@ -99,9 +121,61 @@ def init_sliding_attacks() -> tuple[list[int], list[int], dict[int, dict[int, in
         for index in range(occupancy_indicies):
             occupancy = set_occupancy(index, relevant_bits, attack_mask)  # Set occupancy
             magic_index = ((occupancy * rook_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> (64 - rook_relevant_bits[square])  # Calculate magic index
-            rook_attacks[square][magic_index] = generate_rook_attacks_on_the_fly(square, occupancy)  # Generate rook attacks
+            rook_attacks[rook_offsets[square] + magic_index] = generate_rook_attacks_on_the_fly(square, occupancy)  # Generate rook attacks
     
     return bishop_masks, rook_masks, bishop_attacks, rook_attacks  # Return initialized data
+
+# On-disk cache of the sliding attack tables, stored next to the engine's modules
+ATTACKS_CACHE_PATH: Final = os.path.join(os.path.dirname(os.path.abspath(__file__)), "attacks.cache")
+ATTACKS_CACHE_FORMAT: Final = 1
+
+def attacks_cache_fingerprint() -> bytes:
+    """Return the fingerprint written at the start of the cache file. It changes whenever the magic numbers, relevant bits, file format or byte order change."""
+    digest = hashlib.sha256(f"{ATTACKS_CACHE_FORMAT}:{sys.byteorder}".encode())
+    for numbers in (bishop_magic_numbers, rook_magic_numbers, bishop_relevant_bits, rook_relevant_bits):
+        digest.update(("," + ",".join(map(str, numbers))).encode())
+    return digest.digest()
+
+def save_sliding_attacks(path: str, bishop_masks: list[int], rook_masks: list[int], bishop_attacks: array, rook_attacks: array) -> None:
+    """Write the masks and attack tables to the cache file. The file is written aside and renamed so readers never see a partial file."""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(attacks_cache_fingerprint())
+        array('Q', bishop_masks).tofile(file)
+        array('Q', rook_masks).tofile(file)
+        bishop_attacks.tofile(file)
+        rook_attacks.tofile(file)
+    os.replace(temp_path, path)
+
+def load_sliding_attacks(path: str = ATTACKS_CACHE_PATH) -> tuple[list[int], list[int], memoryview | array, memoryview | array]:
+    """
+    Load the masks and attack tables by memory-mapping the cache file.
+    The tables are rebuilt with `init_sliding_attacks` and the cache rewritten if the file is missing or stale.
+    """
+    fingerprint = attacks_cache_fingerprint()
+    header_size = len(fingerprint)
+    expected_size = header_size + 8 * (64 + 64 + bishop_table_size + rook_table_size)
+    
+    try:
+        with open(path, "rb") as file:
+            cache = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(cache) == expected_size and cache[:header_size] == fingerprint:
+            tables = memoryview(cache)[header_size:].cast('Q')
+            bishop_masks = tables[:64].tolist()
+            rook_masks = tables[64:128].tolist()
+            bishop_attacks = tables[128:128 + bishop_table_size]
+            rook_attacks = tables[128 + bishop_table_size:]
+            return bishop_masks, rook_masks, bishop_attacks, rook_attacks
+        cache.close()
+    except (OSError, ValueError): # Missing or empty cache file
+        pass
+    
+    tables = init_sliding_attacks()
+    try:
+        save_sliding_attacks(path, *tables)
+    except OSError: # Read-only install, keep the tables in memory
+        pass
+    return tables
     
 if __name__ == "__main__":
     init_magic_numbers()
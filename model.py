@@ -7,6 +7,8 @@ from typing import List, Tuple
 from sklearn.model_selection import train_test_split
 
 from LMDB import LMDBWrapper
+from board import Board
+from position_encoding import positions_to_tensors
 
 # TensorFlow setup
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
@@ -23,40 +25,13 @@ from tensorflow.python.framework.ops import get_default_graph  # type: ignore
 from tensorflow.keras.losses import Huber  # type: ignore
 
 
-def fen_to_tensor(fen: str) -> np.ndarray:
-    """Convert a FEN-like string to a (8, 8, 17) tensor for CNN input."""
-    values = list(map(int, fen[1:-1].split(",")))
-    assert len(values) == 69, f"Expected 69 values (64 board + 4 castling + 1 ep), got {len(values)}"
-
-    board_flat = values[:64]
-    castling = values[64:68]
-    ep_square = values[68]
-
-    tensor = np.zeros((8, 8, 17), dtype=np.int8)
-
-    for i, val in enumerate(board_flat):
-        if val == 0:
-            continue
-        plane = val - 1
-        row, col = divmod(i, 8)
-        tensor[row, col, plane] = 1
-
-    for i, right in enumerate(castling):
-        tensor[:, :, 12 + i] = right
-
-    if ep_square != 0:
-        row, col = divmod(ep_square, 8)
-        tensor[row, col, 16] = 1
-
-    return tensor
-
-
 def read_chunk(start_idx: int, end_idx: int, db_path: str) -> Tuple[np.ndarray, np.ndarray]:
     """Worker function to read a chunk of the DB and count categories."""
-    db = LMDBWrapper(db_path)
+    db = LMDBWrapper(db_path, migrate=False) # Migrated by load_inputs
     cursor = db.env.begin().cursor()
 
-    X_list, Y_list = [], []
+    board = Board()
+    positions, Y_list = [], []
 
     for i, (key_bytes, value_bytes) in enumerate(cursor):
         if i < start_idx:
@@ -69,11 +44,13 @@ def read_chunk(start_idx: int, end_idx: int, db_path: str) -> Tuple[np.ndarray,
         value_array = np.frombuffer(value_bytes, dtype=dtype, count=1)
         eval_value = value_array[0]['eval']
 
-        key_encoded = fen_to_tensor(key)
-        X_list.append(key_encoded)
+        if isinstance(key, str): # Legacy scoreboard array key
+            board.parse_fen(board.from_scoreboard_array(key))
+            key = board.encode_position()
+        positions.append(key)
         Y_list.append(eval_value)
 
-    return np.array(X_list, dtype=np.int8), np.array(Y_list, dtype=np.float32)
+    return positions_to_tensors(positions), np.array(Y_list, dtype=np.float32)
 
 
 def load_inputs() -> Tuple[np.ndarray, np.ndarray]:
@@ -167,6 +144,7 @@ def plot_history(history: tf.keras.callbacks.History):
 
 
 if __name__ == "__main__":
+    # Inputs follow LEGACY_EN_PASSANT_PLANE, the saved model only fits inputs built with the same setting
     multiprocessing.set_start_method("spawn", force=True)
 
     X, y = load_inputs()
@@ -1,29 +1,31 @@
 """
 Move encoding:
 
-The move is encoded in 24 bits. 
+The move is encoded in 28 bits. 
 The first 6 bits store the source square,
 the next 6 bits store the target square, 
 the next 4 bits store the piece, 
 the next 4 bits store the promoted piece,
-and the next 3 bits store the flags. The flags are as follows:
+the next 4 bits store the flags,
+and the last 4 bits store the captured piece (only meaningful when the capture flag is set). The flags are as follows:
           
-0000  0000  0000  0000  0011  1111    source square      0x3f
-0000  0000  0000  1111  1100  0000    target square      0xfc0
-0000  0000  1111  0000  0000  0000    piece              0xf000
-0000  1111  0000  0000  0000  0000    promoted piece     0xf000
-0001  0000  0000  0000  0000  0000    capture flag       0x100000
-0010  0000  0000  0000  0000  0000    double push flag   0x200000
-0100  0000  0000  0000  0000  0000    enpassant flag     0x400000
-1000  0000  0000  0000  0000  0000    castling flag      0x800000
+0000  0000  0000  0000  0000  0011  1111    source square      0x3f
+0000  0000  0000  0000  1111  1100  0000    target square      0xfc0
+0000  0000  0000  1111  0000  0000  0000    piece              0xf000
+0000  0000  1111  0000  0000  0000  0000    promoted piece     0xf0000
+0000  0001  0000  0000  0000  0000  0000    capture flag       0x100000
+0000  0010  0000  0000  0000  0000  0000    double push flag   0x200000
+0000  0100  0000  0000  0000  0000  0000    enpassant flag     0x400000
+0000  1000  0000  0000  0000  0000  0000    castling flag      0x800000
+1111  0000  0000  0000  0000  0000  0000    captured piece     0xf000000
 """
 
 from headers import *
 
 
-def encode_move(source: int, target: int, piece: int, promoted: int, capture: int, double_push: int, enpassant: int, castling: int) -> int:
-    """Encode a chess move into a 24-bit integer by the defined format."""
-    return source | (target << 6) | (piece << 12) | (promoted << 16) | (capture << 20) | (double_push << 21) | (enpassant << 22) | (castling << 23)
+def encode_move(source: int, target: int, piece: int, promoted: int, capture: int, double_push: int, enpassant: int, castling: int, captured: int = 0) -> int:
+    """Encode a chess move into a 28-bit integer by the defined format."""
+    return source | (target << 6) | (piece << 12) | (promoted << 16) | (capture << 20) | (double_push << 21) | (enpassant << 22) | (castling << 23) | (captured << 24)
 
 def print_move(move):
     print(str_move(move))
@@ -85,3 +87,7 @@ def get_move_enpassant(move: int) -> int:
 def get_move_castling(move: int) -> int:
     """Check if the move is a castling."""
     return (move >> 23) & 0x1
+
+def get_move_captured(move: int) -> int:
+    """Get the captured piece from the move."""
+    return (move >> 24) & 0xf
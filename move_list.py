@@ -0,0 +1,90 @@
+from itertools import islice
+from typing import Callable, Iterator
+from headers import MAX_MOVES
+
+
+class MoveList:
+    """
+    Fixed-capacity move buffer filled by the move generators.
+    The moves and their ordering scores live in two preallocated lists, and only the first count entries are valid,
+    so a buffer can be reused for every node of a search (one per ply) without allocating.
+    """
+    __slots__ = ("moves", "scores", "count")
+
+    def __init__(self, capacity: int = MAX_MOVES) -> None:
+        self.moves = [0] * capacity
+        self.scores = [0] * capacity
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> int:
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("move list index out of range")
+        return self.moves[index]
+
+    def __iter__(self) -> Iterator[int]:
+        return islice(self.moves, self.count)
+
+    def __contains__(self, move: int) -> bool:
+        try:
+            self.moves.index(move, 0, self.count)
+            return True
+        except ValueError:
+            return False
+
+    def __repr__(self) -> str:
+        return f"MoveList({self.moves[:self.count]})"
+
+    def append(self, move: int) -> None:
+        """Add a move at the end of the list."""
+        self.moves[self.count] = move
+        self.count += 1
+
+    def clear(self) -> None:
+        """Empty the list, the buffer itself is kept for reuse."""
+        self.count = 0
+
+    def swap_remove(self, index: int) -> int:
+        """Remove and return the move at index in O(1) by moving the last move into its place. The order is not kept."""
+        moves = self.moves
+        move = moves[index]
+        self.count -= 1
+        moves[index] = moves[self.count]
+        self.scores[index] = self.scores[self.count]
+        return move
+
+    def score(self, scorer: Callable[[int], int]) -> None:
+        """Fill the ordering score of every move with scorer(move)."""
+        moves = self.moves
+        scores = self.scores
+        for i in range(self.count):
+            scores[i] = scorer(moves[i])
+
+    def sort(self) -> None:
+        """Sort the moves in place by descending score."""
+        count = self.count
+        pairs = sorted(zip(self.scores[:count], self.moves[:count]), key=lambda pair: pair[0], reverse=True)
+        self.scores[:count] = [pair[0] for pair in pairs]
+        self.moves[:count] = [pair[1] for pair in pairs]
+
+    def pick_best(self, start: int) -> int:
+        """
+        Swap the best scored move from start on into position start and return it.
+        Selecting one move at a time is cheaper than a full sort when a cutoff is likely to come early.
+        """
+        moves = self.moves
+        scores = self.scores
+        best = start
+        best_score = scores[start]
+        for i in range(start + 1, self.count):
+            if scores[i] > best_score:
+                best = i
+                best_score = scores[i]
+        if best != start:
+            moves[start], moves[best] = moves[best], moves[start]
+            scores[start], scores[best] = scores[best], scores[start]
+        return moves[start]
@@ -0,0 +1,72 @@
+from typing import Iterator
+from board import Board
+from headers import *
+from move import get_move_capture, get_move_captured, get_move_piece, get_move_promoted, get_move_source, get_move_target
+from move_list import MoveList
+
+# Most valuable victim - least valuable attacker, indexed [victim][attacker] by piece type (pawn to king)
+mvv_lva_scores: Final = [[(victim + 1) * 10 - (attacker + 1) for attacker in range(6)] for victim in range(6)]
+
+def capture_score(move: int) -> int:
+    """Order captures and promotions by MVV-LVA, read from the move encoding. A promotion counts as a pawn capturing the promoted piece."""
+    score = 0
+    if get_move_capture(move):
+        score = mvv_lva_scores[get_move_captured(move) % 6][get_move_piece(move) % 6]
+    promoted = get_move_promoted(move)
+    if promoted:
+        score += mvv_lva_scores[promoted % 6][0]
+    return score
+
+class MovePicker:
+    """
+    Lazily yields the legal moves of a position in stages:
+    transposition table move, captures and promotions, killer moves, quiet moves.
+    A stage is only generated once the previous one is exhausted, so a beta cutoff
+    early on never pays for generating the quiet moves.
+    Captures are picked by MVV-LVA and quiet moves by their score in the [source][target] history table,
+    one best move at a time, so no move has to be made to order them.
+    The board must be back in the picked position whenever the next move is requested.
+    The stages are generated into the captures and quiets buffers if given (the ones of the ply, see `Search`),
+    which must not be reused before the picker is done.
+    """
+    def __init__(self, board: Board, tt_move: int = 0, killers: tuple[int, ...] | list[int] = (), history: list[list[int]] | None = None,
+                 captures: MoveList | None = None, quiets: MoveList | None = None) -> None:
+        self.board = board
+        self.tt_move = tt_move
+        self.killers = killers
+        self.history = history
+        self.captures = captures
+        self.quiets = quiets
+
+    def __iter__(self) -> Iterator[int]:
+        board = self.board
+        tt_move = self.tt_move
+
+        # Transposition table move, it may come from another position with the same key
+        if tt_move and board.is_move_legal(tt_move):
+            yield tt_move
+
+        # Captures and promotions, best victim first
+        captures = board.generate_captures(self.captures)
+        captures.score(capture_score)
+        for index in range(len(captures)):
+            move = captures.pick_best(index)
+            if move != tt_move:
+                yield move
+
+        # Killer moves, only quiet ones since the captures were already played
+        played = [tt_move]
+        for killer in self.killers:
+            if killer and killer not in played and not get_move_capture(killer) and not get_move_promoted(killer) and board.is_move_legal(killer):
+                played.append(killer)
+                yield killer
+
+        # Quiet moves, by history score
+        quiets = board.generate_quiets(self.quiets)
+        history = self.history
+        if history is not None:
+            quiets.score(lambda move: history[get_move_source(move)][get_move_target(move)])
+        for index in range(len(quiets)):
+            move = quiets.pick_best(index) if history is not None else quiets[index]
+            if move not in played:
+                yield move
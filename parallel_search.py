@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+import weakref
+from typing import Callable
+from board import Board
+from headers import *
+from search import Search
+from time_control import TimeControl
+from transposition import SharedTranspositionTable
+
+def search_worker(connection, make_search: Callable[[Board, SharedTranspositionTable], Search], tt_name: str, tt_size_mb: int, stop_event, start_depth: int) -> None:
+    """
+    Helper process of a parallel search. Searches every position it receives as a board snapshot
+    with no depth limit, from start_depth on, until the stop event is set, and sends back
+    the best move, the completed depth and the nodes. Exits on None.
+    """
+    tt = SharedTranspositionTable(tt_size_mb, tt_name)
+    board = Board()
+    search = make_search(board, tt)
+    search.max_depth = 0
+    search.max_nodes = 0
+    search.time_control = None
+    search.stop_event = stop_event
+    search.start_depth = start_depth
+
+    while (snapshot := connection.recv()) is not None:
+        board.restore_board(snapshot)
+        search.search()
+        connection.send((search.best_move, search.completed_depth, search.nodes))
+
+    tt.close()
+
+class ParallelSearch(Search):
+    """
+    Lazy SMP: the search of the main process runs as usual while workers - 1 helper processes search the same position,
+    all of them sharing a transposition table in shared memory. The helpers only fill the table, the move comes from the main search,
+    which finds more cutoffs and better move ordering in the table than it would on its own.
+    Helpers start their iterations at staggered depths, every other helper one ply deeper, so they don't all search the same tree,
+    and they search until the main search is done.
+    make_search builds the search of a helper from its board and the shared table, it must be picklable
+    (a module level function or a partial of one) and build a search with the same evaluation as this one.
+    The helpers are started by the first search and stopped by `close`, or when this search is garbage collected.
+    """
+    def __init__(self, board: Board, evaluate: Callable[[], int], make_search: Callable[[Board, SharedTranspositionTable], Search], workers: int = 1,
+                 max_depth: int = SEARCH_DEPTH, max_nodes: int = 0, tt: SharedTranspositionTable | None = None,
+                 piece_values: tuple[int, ...] | None = None, time_control: TimeControl | None = None) -> None:
+        super().__init__(board, evaluate, max_depth, max_nodes, tt if tt is not None else SharedTranspositionTable(), piece_values, time_control)
+        self.make_search = make_search
+        self.workers = workers
+        self.helpers = []
+        self.connections = []
+        self.helpers_stop = None # Set once the main search is done, the main search itself doesn't stop on it
+        self.helper_nodes = 0
+        self.helper_depth = 0 # Deepest iteration a helper completed in the last search
+        weakref.finalize(self, ParallelSearch.stop_helpers, self.helpers, self.connections, os.getpid())
+
+    def start_helpers(self) -> None:
+        """Start the helper processes."""
+        self.helpers_stop = multiprocessing.Event()
+        for worker in range(1, self.workers):
+            connection, helper_connection = multiprocessing.Pipe()
+            helper = multiprocessing.Process(target=search_worker, daemon=True,
+                                             args=(helper_connection, self.make_search, self.tt.name, self.tt.size_mb, self.helpers_stop, 1 + worker % 2))
+            helper.start()
+            self.helpers.append(helper)
+            self.connections.append(connection)
+
+    @staticmethod
+    def stop_helpers(helpers: list, connections: list, owner_pid: int) -> None:
+        """Stop the helper processes and wait for them to exit, unless called from a forked copy of the search."""
+        if owner_pid != os.getpid():
+            return
+        for connection in connections:
+            connection.send(None)
+        for helper in helpers:
+            helper.join()
+        helpers.clear()
+        connections.clear()
+
+    def close(self) -> None:
+        """Stop the helper processes, the next search starts them again."""
+        ParallelSearch.stop_helpers(self.helpers, self.connections, os.getpid())
+
+    def search(self) -> int:
+        """Search the current position with the helpers and return the best move of the main search, or 0 if there is no legal move."""
+        if len(self.helpers) < self.workers - 1:
+            self.start_helpers()
+
+        if self.helpers:
+            self.helpers_stop.clear()
+        snapshot = self.board.copy_board()
+        for connection in self.connections:
+            connection.send(snapshot)
+
+        move = super().search()
+
+        if self.helpers:
+            self.helpers_stop.set()
+        self.helper_nodes = 0
+        self.helper_depth = 0
+        for connection in self.connections:
+            _, depth, nodes = connection.recv()
+            self.helper_nodes += nodes
+            self.helper_depth = max(self.helper_depth, depth)
+
+        return move
+
+    def report(self) -> str:
+        """Return a one line summary of the last search, helpers included."""
+        return f"{super().report()} helpers {self.workers - 1} helper nodes {self.helper_nodes} helper depth {self.helper_depth}"
@@ -3,44 +3,146 @@ from headers import *
 from bit import *
 from board import Board
 from move import *
+from move_list import MoveList
+import multiprocessing
 
-def perft_driver(board: Board, depth: int) -> int:
+# One move buffer per remaining depth, so the recursion never allocates a move list
+perft_move_lists = [MoveList() for _ in range(MAX_PLY)]
+
+class PerftTable:
+    """
+    Fixed-size transposition table for perft, mapping (position key, depth) to a node count.
+    The entries live in parallel lists indexed by the low bits of the Zobrist key,
+    and a colliding entry is always replaced by the newer one.
+    """
+    __slots__ = ("keys", "depths", "counts", "mask")
+
+    def __init__(self, size: int = PERFT_TABLE_SIZE) -> None:
+        size = 1 << (max(size, 1).bit_length() - 1) # Round down to a power of two
+        self.keys = [0] * size
+        self.depths = [0] * size # Depth 0 is never stored, so it marks an empty entry
+        self.counts = [0] * size
+        self.mask = size - 1
+
+    def probe(self, key: int, depth: int) -> int:
+        """Return the stored node count of the position at the given depth, or -1 if it is not in the table."""
+        index = key & self.mask
+        if self.keys[index] == key and self.depths[index] == depth:
+            return self.counts[index]
+        return -1
+
+    def store(self, key: int, depth: int, count: int) -> None:
+        """Store the node count of the position at the given depth."""
+        index = key & self.mask
+        self.keys[index] = key
+        self.depths[index] = depth
+        self.counts[index] = count
+
+def perft_driver(board: Board, depth: int, table: PerftTable | None = None, bulk: bool = True) -> int:
     """
     Recursively calculates the number of possible legal moves in a chess position 
     up to a given depth, commonly used for debugging and validating chess engines.
+    If a table is given, transposed subtrees are counted once and then looked up by the position key.
+    With bulk counting the last ply is counted from the length of the legal move list without playing the moves,
+    turning it off plays every leaf and is only useful to cross-check make/unmake.
     """
     if depth == 0:
         return 1
     
-    moves = board.generate_moves()
+    if bulk and depth == 1:
+        return len(board.generate_legal_moves(move_list=perft_move_lists[1]))
+    
+    if table is not None:
+        count = table.probe(board.hash, depth)
+        if count >= 0:
+            return count
+    
+    moves = board.generate_legal_moves(move_list=perft_move_lists[depth])
     count = 0
     for move in moves:
-        copy = board.copy_board()
-        if board.make_move(move):
-            count += perft_driver(board, depth - 1)
-            board.restore_board(*copy)
+        board.make_move(move, is_legal=True)
+        count += perft_driver(board, depth - 1, table, bulk)
+        board.unmake_move(move)
 
+    if table is not None:
+        table.store(board.hash, depth, count)
     return count
 
-def perft_test(starting_fen: str, depth: int) -> int:
+def perft_test(starting_fen: str, depth: int, hash_size: int = 0, jobs: int = 1, bulk: bool = True) -> int:
     """
     Performs a perft (performance test) on a chess position to count the total number 
     of legal moves at a given depth. This is commonly used to validate the correctness 
     of a chess engine's move generation.
+    A hash_size above 0 enables a perft table with that many entries (rounded down to a power of two).
+    With jobs above 1 the tree is split between that many processes, see `parallel_perft_test`.
+    bulk turns bulk counting at the last ply on or off, see `perft_driver`.
     """
+    if jobs > 1 and depth > 1:
+        return parallel_perft_test(starting_fen, depth, jobs, hash_size, bulk)
+    
     board = Board(starting_fen)
     if depth == 0:
         return 1
     
-    moves = board.generate_moves()
+    table = PerftTable(hash_size) if hash_size > 0 else None
+    
+    moves = board.generate_legal_moves()
     total = 0
     for move in moves:
-        copy = board.copy_board()
-        if board.make_move(move):
-            count = perft_driver(board, depth - 1)
-            print(f"{str_move(move)}: {count}")
-            board.restore_board(*copy)
-            total += count
+        board.make_move(move, is_legal=True)
+        count = perft_driver(board, depth - 1, table, bulk)
+        print(f"{str_move(move)}: {count}")
+        board.unmake_move(move)
+        total += count
+
+    return total
+
+# The perft table of a worker process, shared by all the subtrees it counts
+worker_table: PerftTable | None = None
+
+def init_perft_worker(hash_size: int) -> None:
+    """Set up the perft table of a worker process."""
+    global worker_table
+    worker_table = PerftTable(hash_size) if hash_size > 0 else None
+
+def perft_subtree(fen: str, path: tuple[int, ...], depth: int, bulk: bool) -> tuple[int, int]:
+    """Count the nodes below the given line of moves from the FEN position, and return them with the root move."""
+    board = Board(fen)
+    for move in path:
+        board.make_move(move, is_legal=True)
+    return path[0], perft_driver(board, depth - len(path), worker_table, bulk)
+
+def parallel_perft_test(starting_fen: str, depth: int, jobs: int = 0, hash_size: int = 0, bulk: bool = True) -> int:
+    """
+    Performs a perft test with the tree split between a pool of jobs processes (0 means one per core).
+    Each worker rebuilds the board from the FEN and plays the moves leading to its subtree.
+    Below depth 3 the root moves are the tasks, deeper the split is at depth 2, which gives many more tasks
+    of a more even size. The output is the same per root move divide as `perft_test`.
+    """
+    board = Board(starting_fen)
+    if depth == 0:
+        return 1
+    
+    root_moves = list(board.generate_legal_moves())
+    tasks = []
+    for move in root_moves:
+        if depth < 3:
+            tasks.append((starting_fen, (move,), depth, bulk))
+            continue
+        board.make_move(move, is_legal=True)
+        for reply in board.generate_legal_moves():
+            tasks.append((starting_fen, (move, reply), depth, bulk))
+        board.unmake_move(move)
+    
+    counts = dict.fromkeys(root_moves, 0)
+    with multiprocessing.Pool(jobs or multiprocessing.cpu_count(), init_perft_worker, (hash_size,)) as pool:
+        for move, count in pool.starmap(perft_subtree, tasks, chunksize=1):
+            counts[move] += count
+    
+    total = 0
+    for move in root_moves:
+        print(f"{str_move(move)}: {counts[move]}")
+        total += counts[move]
 
     return total
 
@@ -0,0 +1,75 @@
+import numpy as np
+from headers import LEGACY_EN_PASSANT_PLANE, POSITION_SIZE
+
+def positions_to_array(positions: bytes | list[bytes] | np.ndarray) -> np.ndarray:
+    """Return encoded positions (one, a list of them, or a concatenated buffer) as a (N, POSITION_SIZE) uint8 array without copying when possible."""
+    if isinstance(positions, np.ndarray):
+        return positions.reshape(-1, POSITION_SIZE)
+    if isinstance(positions, list):
+        positions = b"".join(positions)
+    return np.frombuffer(positions, dtype=np.uint8).reshape(-1, POSITION_SIZE)
+
+def decode_positions(positions: bytes | list[bytes] | np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decodes positions encoded by `Board.encode_position` in bulk, with no Python loop over the positions.
+    Returns the pieces (N, 64) with -1 for an empty square, the side to move (N,),
+    the castling rights (N, 4) as 0/1 in KQkq order and the en passant square (N,) with -1 for none, all int8.
+    """
+    data = positions_to_array(positions)
+    squares = data[:, :32]
+
+    pieces = np.empty((len(data), 64), dtype=np.int8)
+    pieces[:, 0::2] = squares & 15
+    pieces[:, 1::2] = squares >> 4
+    pieces -= 1
+
+    flags = data[:, 32]
+    turn = (flags & 1).astype(np.int8)
+    castling = ((flags[:, None] >> np.arange(1, 5, dtype=np.uint8)) & 1).astype(np.int8)
+    en_passant = data[:, 33].astype(np.int8) - 1
+
+    return pieces, turn, castling, en_passant
+
+def bitboards_to_tensors(bitboards: np.ndarray, castling: np.ndarray, en_passant: np.ndarray, out: np.ndarray | None = None,
+                         legacy_en_passant: bool = LEGACY_EN_PASSANT_PLANE) -> np.ndarray:
+    """
+    Builds the (N, 8, 8, 17) int8 network input from the piece bitboards (N, 12) as uint64, the castling rights (N, 4)
+    and the en passant squares (N,). Planes 0-11 are the pieces indexed [rank][file], planes 12-15 the castling rights
+    broadcast over the board and plane 16 the en passant square. The bitboards are unpacked with a byte view and unpackbits,
+    without a loop over the squares. Every cell of out is written, so a preallocated buffer can be reused between batches.
+    With legacy_en_passant, a position without an en passant square has h8 set in plane 16, like the inputs the shipped
+    model was trained on, see LEGACY_EN_PASSANT_PLANE.
+    """
+    count = len(bitboards)
+    if out is None:
+        out = np.empty((count, 8, 8, 17), dtype=np.int8)
+
+    # Little endian bytes of each bitboard, bit i of the unpacked 64 bits is square i
+    squares = np.unpackbits(np.ascontiguousarray(bitboards, dtype="<u8").view(np.uint8).reshape(count, 12, 8), axis=-1, bitorder="little")
+    out[..., :12] = squares.reshape(count, 12, 8, 8).transpose(0, 2, 3, 1)
+    out[..., 12:16] = np.asarray(castling, dtype=np.int8)[:, None, None, :]
+
+    out[..., 16] = 0
+    en_passant = np.asarray(en_passant)
+    if legacy_en_passant:
+        en_passant = np.where(en_passant < 0, 63, en_passant) # divmod(-1, 8) is h8
+    rows = np.flatnonzero(en_passant > 0) # -1 (or 0 in old data) for none
+    out[rows, en_passant[rows] // 8, en_passant[rows] % 8, 16] = 1
+
+    return out
+
+def snapshots_to_tensors(snapshots: list[tuple[int, ...]], out: np.ndarray | None = None, legacy_en_passant: bool = LEGACY_EN_PASSANT_PLANE) -> np.ndarray:
+    """Builds the network input from board snapshots made by `Board.copy_board`, see `bitboards_to_tensors`."""
+    data = np.array(snapshots, dtype=np.uint64).reshape(-1, 14)
+    flags = data[:, 12]
+    castling = (flags[:, None] >> np.arange(1, 5, dtype=np.uint64)) & np.uint64(1)
+    en_passant = ((flags >> np.uint64(5)) & np.uint64(127)).astype(np.int16) - 1
+    return bitboards_to_tensors(data[:, :12], castling, en_passant, out, legacy_en_passant)
+
+def positions_to_tensors(positions: bytes | list[bytes] | np.ndarray, out: np.ndarray | None = None, legacy_en_passant: bool = LEGACY_EN_PASSANT_PLANE) -> np.ndarray:
+    """Builds the network input from positions encoded by `Board.encode_position`, see `bitboards_to_tensors`."""
+    pieces, _, castling, en_passant = decode_positions(positions)
+    # One bit per (piece, square), packed back into the 12 bitboards of each position
+    bits = pieces[:, None, :] == np.arange(12, dtype=np.int8)[None, :, None]
+    bitboards = np.packbits(bits, axis=-1, bitorder="little").view("<u8").reshape(-1, 12)
+    return bitboards_to_tensors(bitboards, castling, en_passant, out, legacy_en_passant)
@@ -13,13 +13,10 @@ class RandomPlayer(Player):
 
     def make_player_move(self) -> int | None:
         """Executes a random move for the player on the chessboard."""
-        all_moves = self.board.generate_moves()
+        all_moves = self.board.generate_legal_moves()
+        if len(all_moves) == 0:
+            return None
 
-        while len(all_moves) != 0:
-            move = random.choice(all_moves)
-            status = self.board.make_move(move)
-            if status:
-                return move
-            else:
-                all_moves.remove(move)
-        return None
\ No newline at end of file
+        move = random.choice(all_moves)
+        self.board.make_move(move, is_legal=True)
+        return move
\ No newline at end of file
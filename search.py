@@ -0,0 +1,265 @@
+from time import perf_counter
+from typing import Callable
+from board import Board
+from headers import *
+from move import get_move_capture, get_move_captured, get_move_promoted, get_move_source, get_move_target
+from move_list import MoveList
+from move_picker import MovePicker, capture_score
+from time_control import TimeControl
+from transposition import TranspositionTable
+
+class Search:
+    """
+    Negamax alpha-beta search with iterative deepening.
+    evaluate scores the board from the point of view of the side to move, and so do all the scores here.
+    The search stops at max_depth (0 for no limit), as soon as max_nodes nodes were visited (0 for no limit)
+    or when the time allocated by time_control runs out, the clock being checked every TIME_CHECK_NODES nodes.
+    A stopped iteration is thrown away except for a root move that beat the best move of the previous one,
+    and the first root move is always searched to the end so there is a move to play.
+    Results are cached in the transposition table tt, which should outlive the search so the next one starts warm.
+    Moves are ordered before they are made: the table move, captures by MVV-LVA, two killer moves per ply
+    and the other quiet moves by a [source][target] history table of the quiet moves that caused cutoffs.
+    Past the last ply a quiescence search plays out the captures and promotions, so the position is only
+    evaluated once it is quiet. piece_values holds the value of each piece type (pawn to king) in evaluation units
+    and enables delta pruning there, leave it out when the evaluation has no material scale.
+    """
+    def __init__(self, board: Board, evaluate: Callable[[], int], max_depth: int = SEARCH_DEPTH, max_nodes: int = 0, tt: TranspositionTable | None = None,
+                 piece_values: tuple[int, ...] | None = None, time_control: TimeControl | None = None) -> None:
+        self.board = board
+        self.evaluate = evaluate
+        self.piece_values = piece_values
+        self.time_control = time_control
+        self.start_time = 0.0
+        self.search_time = 0.0
+        self.soft_limit = 0.0 # Seconds after which no new iteration is started, 0 for no limit
+        self.hard_limit = 0.0 # Seconds after which the search is stopped, 0 for no limit
+        self.stop_event = None # Set by another process to stop the search, see `ParallelSearch`
+        self.start_depth = 1 # Depth of the first iteration
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.stopped = False
+        self.best_move = 0
+        self.best_score = 0
+        self.completed_depth = 0
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [[0] * 64 for _ in range(64)]
+        # One capture and one quiet move buffer per ply, so the search never allocates a move list
+        self.capture_lists = [MoveList() for _ in range(MAX_PLY)]
+        self.quiet_lists = [MoveList() for _ in range(MAX_PLY)]
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def search(self) -> int:
+        """Search the current position and return the best move, or 0 if there is no legal move."""
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.stopped = False
+        self.best_move = 0
+        self.best_score = 0
+        self.completed_depth = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt.new_search()
+        self.start_time = perf_counter()
+        self.soft_limit, self.hard_limit = self.time_control.allocate() if self.time_control else (0.0, 0.0)
+        
+        # Killers belong to the previous position, the history is halved so recent cutoffs weigh more
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+        for scores in self.history:
+            for target in range(64):
+                scores[target] >>= 1
+
+        for depth in range(self.start_depth, (self.max_depth or MAX_PLY - 1) + 1):
+            self.search_root(depth)
+            if self.stopped:
+                break
+            self.completed_depth = depth
+            # A forced mate was found, searching deeper can't improve on it
+            if abs(self.best_score) >= MATE_SCORE - MAX_PLY:
+                break
+            # The next iteration would most likely not finish in time
+            if self.soft_limit and self.elapsed() >= self.soft_limit:
+                break
+
+        self.search_time = self.elapsed()
+        return self.best_move
+
+    def check_limits(self) -> bool:
+        """Return whether the node or time limit was reached, or the stop event set, and stop the search if so, once the first root move has a score."""
+        if not self.best_move:
+            return False
+        if (self.max_nodes and self.nodes >= self.max_nodes) or \
+           (not self.nodes & (TIME_CHECK_NODES - 1) and ((self.hard_limit and self.elapsed() >= self.hard_limit) or
+                                                         (self.stop_event is not None and self.stop_event.is_set()))):
+            self.stopped = True
+        return self.stopped
+
+    def elapsed(self) -> float:
+        """Return the seconds since the last search started."""
+        return perf_counter() - self.start_time
+
+    def cutoff_rate(self) -> float:
+        """Return the share of the beta cutoffs of the last search that the first move tried caused, a measure of the move ordering."""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def report(self) -> str:
+        """Return a one line summary of the last search."""
+        return f"depth {self.completed_depth} score {self.best_score} nodes {self.nodes} (quiescence {self.quiescence_nodes}) time {self.search_time:.2f}s first move cutoffs {self.cutoff_rate():.1%} hashfull {self.tt.hashfull() / 10:.1f}%"
+
+    def search_root(self, depth: int) -> None:
+        """
+        Search every root move to the given depth and update the best move and score.
+        The best move of the previous iteration is searched first, so a better move found
+        before the search is stopped is a real improvement and is kept.
+        """
+        board = self.board
+        tt = self.tt
+        alpha = -INFINITE_SCORE
+        best_move = 0
+
+        # The first iteration starts from the move a previous search stored for this position
+        tt_move = self.best_move
+        if not tt_move and (entry := tt.probe(board.hash)):
+            tt_move = entry[0]
+
+        for move in MovePicker(board, tt_move, captures=self.capture_lists[0], quiets=self.quiet_lists[0]):
+            board.make_move(move, is_legal=True)
+            score = -self.negamax(depth - 1, -INFINITE_SCORE, -alpha, 1)
+            board.unmake_move(move)
+
+            if self.stopped:
+                break
+            if score > alpha:
+                alpha = score
+                best_move = move
+                # Kept right away, the search may be stopped at any later move
+                self.best_move = move
+                self.best_score = score
+
+        if best_move and not self.stopped:
+            tt.store(board.hash, best_move, depth, alpha, bound.exact, 0)
+
+    def negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        """Return the score of the current position searched to the given depth, within the (alpha, beta) window."""
+        if depth == 0:
+            return self.quiescence(alpha, beta, ply)
+        
+        if self.check_limits():
+            return 0
+        self.nodes += 1
+
+        board = self.board
+        # Fifty move rule
+        if board.halfmove >= 100:
+            return 0
+
+        # Transposition table cutoff, if the stored search was deep enough and its bound settles the window
+        tt = self.tt
+        key = board.hash
+        tt_move = 0
+        entry = tt.probe(key, ply)
+        if entry:
+            tt_move, tt_depth, bound_type, score = entry
+            if tt_depth >= depth and (bound_type == bound.exact or (bound_type == bound.lower and score >= beta) or (bound_type == bound.upper and score <= alpha)):
+                return score
+
+        original_alpha = alpha
+        best_score = -INFINITE_SCORE
+        best_move = 0
+        moves_searched = 0
+        killers = self.killers[ply]
+        for move in MovePicker(board, tt_move, killers, self.history, self.capture_lists[ply], self.quiet_lists[ply]):
+            moves_searched += 1
+            board.make_move(move, is_legal=True)
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move(move)
+
+            if self.stopped:
+                return 0
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    best_move = move
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        if moves_searched == 1:
+                            self.first_move_cutoffs += 1
+                        # Remember the quiet moves that cause cutoffs
+                        if not get_move_capture(move) and not get_move_promoted(move):
+                            if killers[0] != move:
+                                killers[1] = killers[0]
+                                killers[0] = move
+                            self.history[get_move_source(move)][get_move_target(move)] += depth * depth
+                        break
+
+        # Checkmate or stalemate, a mate found sooner scores higher
+        if not moves_searched:
+            best_score = -MATE_SCORE + ply if board.is_king_in_check(board.turn) else 0
+            tt.store(key, 0, depth, best_score, bound.exact, ply)
+            return best_score
+
+        if best_score >= beta:
+            bound_type = bound.lower
+        elif best_score > original_alpha:
+            bound_type = bound.exact
+        else:
+            bound_type = bound.upper
+        tt.store(key, best_move, depth, best_score, bound_type, ply)
+
+        return best_score
+
+    def quiescence(self, alpha: int, beta: int, ply: int) -> int:
+        """
+        Return the score of the current position once the captures and promotions are played out, within the (alpha, beta) window.
+        The side to move may stand pat on the evaluation instead of capturing. With piece values, captures that can't
+        raise the evaluation to alpha even when winning the captured piece and a margin of two pawns are skipped (delta pruning).
+        """
+        if self.check_limits():
+            return 0
+        self.nodes += 1
+        self.quiescence_nodes += 1
+
+        # Stand pat, the side to move doesn't have to capture
+        stand_pat = self.evaluate()
+        if stand_pat >= beta or ply >= MAX_PLY - 1:
+            return stand_pat
+        
+        piece_values = self.piece_values
+        if piece_values:
+            margin = 2 * piece_values[0]
+            # Even winning a queen, or a rook and a promotion, won't reach alpha
+            if stand_pat + 2 * piece_values[4] - piece_values[0] + margin < alpha:
+                return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        board = self.board
+        captures = board.generate_captures(self.capture_lists[ply])
+        captures.score(capture_score)
+        best_score = stand_pat
+        for index in range(len(captures)):
+            move = captures.pick_best(index)
+
+            # Delta pruning, promotions are always searched
+            if piece_values and not get_move_promoted(move) and stand_pat + piece_values[get_move_captured(move) % 6] + margin <= alpha:
+                continue
+
+            board.make_move(move, is_legal=True)
+            score = -self.quiescence(-beta, -alpha, ply + 1)
+            board.unmake_move(move)
+
+            if self.stopped:
+                return 0
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        return best_score
@@ -18,34 +18,25 @@ class SmartPlayer(Player):
         from a database or a default score. Returns the chosen move or None if no
         valid moves are available.
         """
-        all_moves = self.board.generate_moves()
+        all_moves = self.board.generate_legal_moves()
         moves_with_evaluations = []
         
         # Sort them by evaluation
         for move in all_moves:
-            # Get move's FEN:
-            FEN = ""
-            restore = self.board.copy_board()
-            result = self.board.make_move(move)
+            # Get the position's database key
+            self.board.make_move(move, is_legal=True)
+            position = self.board.encode_position()
+            self.board.unmake_move(move)
             
-            if result:
-                FEN = self.board.to_scoreboard_array()
-                self.board.restore_board(*restore)
-            else:
-                continue
-            
-            if (data := self.db.get(FEN)) is not None:
+            if (data := self.db.get(position)) is not None:
                 moves_with_evaluations.append((move, data[0]))
             else:
                 moves_with_evaluations.append((move, 0))
         
+        if len(moves_with_evaluations) == 0:
+            return None
+        
         moves_with_evaluations.sort(key=lambda x: x[1], reverse=True)
-        while len(moves_with_evaluations) != 0:
-            move = moves_with_evaluations[0][0]
-            status = self.board.make_move(move)
-            if status:
-                return move
-            else:
-                moves_with_evaluations.remove(move)
-                
-        return None
\ No newline at end of file
+        move = moves_with_evaluations[0][0]
+        self.board.make_move(move, is_legal=True)
+        return move
\ No newline at end of file
@@ -0,0 +1,50 @@
+import pytest
+from board import Board
+from headers import *
+from zobrist import generate_hash
+
+# Black king attacked by the rook with white to move, white could capture it
+CHECK_NOT_TO_MOVE: Final = "4k3/8/8/8/8/8/4R3/4K3 w - - 0 1"
+
+def test_fen_with_side_not_to_move_in_check_is_rejected():
+    assert not Board.validate_fen(CHECK_NOT_TO_MOVE)
+    with pytest.raises(ValueError):
+        Board(CHECK_NOT_TO_MOVE)
+
+def test_fen_with_side_to_move_in_check_is_accepted():
+    board = Board("4k3/8/8/8/8/8/4R3/4K3 b - - 0 1")
+    assert board.is_king_in_check(color.black)
+    assert len(board.generate_legal_moves()) == 4
+
+def test_encoded_position_with_side_not_to_move_in_check_is_rejected():
+    data = bytearray(Board("4k3/8/8/8/8/8/4R3/4K3 b - - 0 1").encode_position())
+    data[32] ^= 1 # White to move
+    with pytest.raises(ValueError):
+        Board().decode_position(bytes(data))
+
+@pytest.mark.parametrize("fen", ["8/8/8/8/8/8/8/4K3 w - - 0 1", "4k3/8/8/8/8/8/8/3KK3 w - - 0 1"])
+def test_fen_without_one_king_per_side_is_rejected(fen):
+    assert not Board.validate_fen(fen)
+
+def test_fen_halfmove_clock_survives_a_snapshot():
+    board = Board(f"4k3/8/8/8/8/8/8/4K3 w - - {MAX_HALFMOVE} 7")
+    board.restore_board(board.copy_board())
+    assert (board.halfmove, board.fullmove) == (MAX_HALFMOVE, 7)
+    assert not Board.validate_fen(f"4k3/8/8/8/8/8/8/4K3 w - - {MAX_HALFMOVE + 1} 7")
+
+def assert_hash(board: Board) -> None:
+    assert board.hash == generate_hash(board.bitboards, board.turn, board.castle, board.en_passant)
+
+@pytest.mark.parametrize("fen", [TRICKY_POSITION, KILLER_POSITION, PERFT_POSITION_4])
+def test_incremental_hash_matches_full_recompute(fen):
+    board = Board(fen)
+    assert_hash(board)
+    for move in board.generate_legal_moves():
+        board.make_move(move, is_legal=True)
+        assert_hash(board)
+        for reply in board.generate_legal_moves():
+            board.make_move(reply, is_legal=True)
+            assert_hash(board)
+            board.unmake_move(reply)
+        board.unmake_move(move)
+        assert_hash(board)
@@ -0,0 +1,65 @@
+from headers import *
+
+class TimeControl:
+    """
+    Time limits and clock of one player, all in milliseconds.
+    With movetime every move may take that long. Otherwise, with a game clock of time plus increment per move,
+    the clock runs down as the player moves and each move gets a share of what is left, see `allocate`.
+    With moves_per_control, time is added again every that many moves, otherwise it has to last the whole game.
+    With neither movetime nor time the player has no time limit.
+    """
+    def __init__(self, movetime: int = 0, time: int = 0, increment: int = 0, moves_per_control: int = 0) -> None:
+        self.movetime = movetime
+        self.time = time
+        self.increment = increment
+        self.moves_per_control = moves_per_control
+        self.remaining = time
+        self.moves_to_go = moves_per_control # Moves until the next time control, 0 for none
+
+    def reset(self) -> None:
+        """Set the clock back for a new game."""
+        self.remaining = self.time
+        self.moves_to_go = self.moves_per_control
+
+    def is_limited(self) -> bool:
+        """Return whether the player's moves are limited in time."""
+        return bool(self.movetime or self.time)
+
+    def allocate(self) -> tuple[float, float]:
+        """
+        Return the soft and hard time limits of the next move in seconds, 0 for none.
+        A new iteration of the search is only started before the soft limit, and the search is stopped at the hard limit.
+        From the clock, the soft limit is the time left spread over the moves to go, plus the increment,
+        at most half the time left. The hard limit lets a move take up to 4 times that, at most 3/4 of the time left.
+        """
+        if self.movetime:
+            limit = max(self.movetime - MOVE_OVERHEAD, 1) / 1000
+            return limit, limit
+
+        if not self.time:
+            return 0.0, 0.0
+
+        time_left = max(self.remaining - MOVE_OVERHEAD, 1)
+        moves = self.moves_to_go or MOVES_TO_GO
+        soft = min(time_left / moves + self.increment, time_left / 2)
+        hard = min(soft * 4, time_left * 3 / 4)
+        return soft / 1000, hard / 1000
+
+    def update(self, elapsed: float) -> None:
+        """Run the clock down by the seconds a move took and add the increment."""
+        if not self.time:
+            return
+        self.remaining -= elapsed * 1000
+        if self.remaining < 0: # Flagged, the clock stays out of time
+            return
+        self.remaining += self.increment
+        if self.moves_to_go:
+            self.moves_to_go -= 1
+            if not self.moves_to_go:
+                # Next time control, same as the first one
+                self.remaining += self.time
+                self.moves_to_go = self.moves_per_control
+
+    def is_flagged(self) -> bool:
+        """Return whether the player ran out of time."""
+        return bool(self.time) and self.remaining < 0
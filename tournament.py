@@ -8,13 +8,14 @@ class Tournament:
     """
     A class to manage and simulate a chess tournament between two players.
     """
-    def __init__(self, player_1_type: int, player_2_type: int, num_games: int = 1):
+    def __init__(self, player_1_type: int, player_2_type: int, num_games: int = 1, depth: int = SEARCH_DEPTH, nodes: int = 0, hash_mb: int = TT_SIZE_MB,
+                 movetime: int = 0, time: int = 0, increment: int = 0, workers: int = 1):
         self.num_games = num_games
         self.games_data = []
         self.results = {"player_1": 0, "player_2": 0, "draw": 0}
         self.db = LMDBWrapper("scoreboards")
         self.model = load_model('model.h5')
-        self.game = Game(player_1_type, player_2_type, self.db, self.model)
+        self.game = Game(player_1_type, player_2_type, self.db, self.model, depth, nodes, hash_mb, movetime, time, increment, workers)
         self.gameSaver = GameSaver(self.db)
         self.save_interval = 100_000
     
@@ -0,0 +1,197 @@
+from array import array
+from multiprocessing import shared_memory
+import os
+import weakref
+from headers import *
+
+# Bytes per entry: key (8), move (4), score (4), depth (1), bound (1), age (1)
+TT_ENTRY_SIZE: Final = 19
+
+# Packed data word of a shared table entry: move (28 bits), score (22 bits, offset), depth (7 bits), bound (2 bits), age (5 bits)
+SHARED_SCORE_SHIFT: Final = 28
+SHARED_DEPTH_SHIFT: Final = 50
+SHARED_BOUND_SHIFT: Final = 57
+SHARED_AGE_SHIFT: Final = 59
+SHARED_SCORE_OFFSET: Final = 1 << 21
+
+def score_to_tt(score: int, ply: int) -> int:
+    """Convert a mate score found at the given ply to a score relative to the position, so it stays right when the position is reached at another ply."""
+    if score >= MATE_SCORE - MAX_PLY:
+        return score + ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+def score_from_tt(score: int, ply: int) -> int:
+    """Convert a stored mate score back to the given ply, see `score_to_tt`."""
+    if score >= MATE_SCORE - MAX_PLY:
+        return score - ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score + ply
+    return score
+
+class TranspositionTable:
+    """
+    Fixed-size transposition table keyed by the Zobrist key of a position.
+    Entries live in parallel preallocated arrays and are grouped in buckets of two slots:
+    the first slot is depth-preferred, it keeps the deepest search of the current search (or any newer one),
+    and the second slot is always replaced by whatever the first slot turned away.
+    Entries written by older searches, see `new_search`, are always replaced.
+    """
+    def __init__(self, size_mb: int = TT_SIZE_MB) -> None:
+        buckets = max(size_mb * 1024 * 1024 // (TT_ENTRY_SIZE * 2), 1)
+        buckets = 1 << (buckets.bit_length() - 1) # Round down to a power of two
+        self.mask = buckets - 1
+        size = buckets * 2
+        self.keys = array('Q', bytes(8 * size))
+        self.moves = array('I', bytes(4 * size))
+        self.scores = array('i', bytes(4 * size))
+        self.depths = array('B', bytes(size))
+        self.bounds = array('B', bytes(size)) # bound.none marks an empty entry
+        self.ages = array('B', bytes(size))
+        self.age = 0
+
+    def new_search(self) -> None:
+        """Start a new search, so that the entries of the previous ones make room for the new ones first."""
+        self.age = (self.age + 1) & 255
+
+    def clear(self) -> None:
+        """Empty the table."""
+        size = len(self.keys)
+        self.bounds = array('B', bytes(size))
+
+    def probe(self, key: int, ply: int = 0) -> tuple[int, int, int, int] | None:
+        """
+        Return the move, depth, bound and score of the entry of the given position, or None if it is not in the table.
+        Mate scores are converted back to the given ply.
+        """
+        index = (key & self.mask) << 1
+        keys = self.keys
+        bounds = self.bounds
+        if not (keys[index] == key and bounds[index]):
+            index += 1
+            if not (keys[index] == key and bounds[index]):
+                return None
+        return self.moves[index], self.depths[index], bounds[index], score_from_tt(self.scores[index], ply)
+
+    def store(self, key: int, move: int, depth: int, score: int, bound_type: int, ply: int) -> None:
+        """
+        Store the result of searching a position to the given depth at the given ply.
+        Mate scores are stored relative to the position, so they stay right when it is reached at another ply.
+        """
+        score = score_to_tt(score, ply)
+
+        index = (key & self.mask) << 1
+        if self.keys[index] != key and self.bounds[index] and self.ages[index] == self.age and self.depths[index] > depth:
+            index += 1 # The depth-preferred slot holds a deeper search, use the always-replace slot
+
+        # Keep the known best move when the new result has none (it failed low)
+        if not move and self.keys[index] == key:
+            move = self.moves[index]
+
+        self.keys[index] = key
+        self.moves[index] = move
+        self.scores[index] = score
+        self.depths[index] = depth
+        self.bounds[index] = bound_type
+        self.ages[index] = self.age
+
+    def hashfull(self) -> int:
+        """Return the permille of the table used by the current search, sampled over the first 1000 entries."""
+        sample = min(1000, len(self.keys))
+        bounds = self.bounds
+        ages = self.ages
+        return sum(1 for index in range(sample) if bounds[index] and ages[index] == self.age) * 1000 // sample
+
+class SharedTranspositionTable:
+    """
+    Transposition table in shared memory, for the processes of a parallel search, with the interface of `TranspositionTable`.
+    The table that creates the memory block owns it and frees it once it is garbage collected or closed,
+    the other processes attach to it by name and must all be given the same size.
+    Entries are lockless: an entry is two 64-bit words, the packed data and the key XORed with the data.
+    A probe only accepts an entry whose words XOR back to its key, so an entry torn by two processes
+    writing it at once reads as a miss instead of as corrupt data.
+    Buckets and replacement are the same as in `TranspositionTable`, the age wraps at 32 searches.
+    """
+    def __init__(self, size_mb: int = TT_SIZE_MB, name: str | None = None) -> None:
+        buckets = max(size_mb * 1024 * 1024 // 32, 1)
+        buckets = 1 << (buckets.bit_length() - 1) # Round down to a power of two
+        self.mask = buckets - 1
+        self.size_mb = size_mb
+        # A new memory block is zeroed, all its entries are empty
+        self.memory = shared_memory.SharedMemory(name, create=name is None, size=buckets * 32)
+        self.name = self.memory.name
+        self.table = self.memory.buf.cast('Q')
+        self.finalizer = weakref.finalize(self, self.release, self.memory, self.table, os.getpid() if name is None else 0)
+        self.age = 0
+
+    @staticmethod
+    def release(memory: shared_memory.SharedMemory, table: memoryview, owner_pid: int) -> None:
+        """Detach from the memory block, and free it if this process created it (not a forked copy of the table)."""
+        table.release()
+        memory.close()
+        if owner_pid == os.getpid():
+            memory.unlink()
+
+    def close(self) -> None:
+        """Detach from the table, see `release`."""
+        self.finalizer()
+
+    def new_search(self) -> None:
+        """Start a new search, so that the entries of the previous ones make room for the new ones first."""
+        self.age = (self.age + 1) & 31
+
+    def clear(self) -> None:
+        """Empty the table."""
+        self.memory.buf[:] = bytes(len(self.memory.buf))
+
+    def probe(self, key: int, ply: int = 0) -> tuple[int, int, int, int] | None:
+        """
+        Return the move, depth, bound and score of the entry of the given position, or None if it is not in the table.
+        Mate scores are converted back to the given ply.
+        """
+        table = self.table
+        index = (key & self.mask) << 2
+        data = table[index + 1]
+        if table[index] ^ data != key or not (data >> SHARED_BOUND_SHIFT) & 3:
+            index += 2
+            data = table[index + 1]
+            if table[index] ^ data != key or not (data >> SHARED_BOUND_SHIFT) & 3:
+                return None
+        score = ((data >> SHARED_SCORE_SHIFT) & 0x3fffff) - SHARED_SCORE_OFFSET
+        return data & 0xfffffff, (data >> SHARED_DEPTH_SHIFT) & 127, (data >> SHARED_BOUND_SHIFT) & 3, score_from_tt(score, ply)
+
+    def store(self, key: int, move: int, depth: int, score: int, bound_type: int, ply: int) -> None:
+        """
+        Store the result of searching a position to the given depth at the given ply.
+        Mate scores are stored relative to the position, so they stay right when it is reached at another ply.
+        """
+        score = score_to_tt(score, ply)
+
+        table = self.table
+        index = (key & self.mask) << 2
+        data = table[index + 1]
+        if table[index] ^ data != key and (data >> SHARED_BOUND_SHIFT) & 3 and (data >> SHARED_AGE_SHIFT) == self.age and \
+           (data >> SHARED_DEPTH_SHIFT) & 127 > depth:
+            index += 2 # The depth-preferred slot holds a deeper search, use the always-replace slot
+            data = table[index + 1]
+
+        # Keep the known best move when the new result has none (it failed low)
+        if not move and table[index] ^ data == key:
+            move = data & 0xfffffff
+
+        data = move | (score + SHARED_SCORE_OFFSET) << SHARED_SCORE_SHIFT | min(depth, 127) << SHARED_DEPTH_SHIFT | \
+               bound_type << SHARED_BOUND_SHIFT | self.age << SHARED_AGE_SHIFT
+        table[index] = key ^ data
+        table[index + 1] = data
+
+    def hashfull(self) -> int:
+        """Return the permille of the table used by the current search, sampled over the first 1000 entries."""
+        table = self.table
+        sample = min(1000, len(table) // 2)
+        count = 0
+        for index in range(0, sample * 2, 2):
+            data = table[index + 1]
+            if (data >> SHARED_BOUND_SHIFT) & 3 and data >> SHARED_AGE_SHIFT == self.age:
+                count += 1
+        return count * 1000 // sample
@@ -0,0 +1,40 @@
+from headers import *
+from bit import *
+import random
+
+def init_zobrist_keys(seed: int = 1070372) -> tuple[list[list[int]], list[int], list[int], int]:
+    """Initialize the random 64-bit keys used for Zobrist hashing. A fixed seed keeps the keys identical between runs and processes."""
+    rng = random.Random(seed)
+    piece_keys = [[rng.getrandbits(64) for _ in range(64)] for _ in range(12)] # [piece][square] (12)(64)
+    castle_keys = [rng.getrandbits(64) for _ in range(16)] # [castling rights] (16)
+    en_passant_keys = [rng.getrandbits(64) for _ in range(64)] # [square] (64)
+    side_key = rng.getrandbits(64) # Hashed in when black is to move
+
+    return piece_keys, castle_keys, en_passant_keys, side_key
+
+piece_keys, castle_keys, en_passant_keys, side_key = init_zobrist_keys()
+
+def generate_hash(bitboards: list[int], turn: int, castle: int, en_passant: int) -> int:
+    """Compute the Zobrist key of a position from scratch."""
+    key = 0
+
+    # Hash pieces
+    for pc in range(12):
+        bitboard = bitboards[pc]
+        while bitboard:
+            square_index = get_ls1b_index(bitboard)
+            key ^= piece_keys[pc][square_index]
+            bitboard &= bitboard - 1
+
+    # Hash castling rights
+    key ^= castle_keys[castle]
+
+    # Hash en passant square
+    if en_passant != square.no_sq:
+        key ^= en_passant_keys[en_passant]
+
+    # Hash side to move
+    if turn == color.black:
+        key ^= side_key
+
+    return key